@@ -0,0 +1,71 @@
+# alias_table.py
+
+#Rôle global :
+# tirage pondéré des adresses d'appel en O(1) par tirage (méthode d'alias de Walker, construction de Vose),
+# avec des poids éventuellement différents pour chaque heure de la journée
+
+import numpy as np
+
+
+#tables (prob, alias) d'une distribution discrète de poids w (vecteur de taille n)
+#un tirage : i uniforme dans [0, n), puis i avec la probabilité prob[i], sinon alias[i]
+#construction vectorisée : à chaque tour, les "petites" cases (q < 1) sont complétées en bloc par les
+#"grandes" (q >= 1) ; une grande case qui donne plus que son excédent devient petite pour le tour suivant
+def _build_alias(w):
+    n = len(w)
+    q = w * (n / w.sum())
+    prob = np.ones(n)
+    alias = np.arange(n, dtype=np.int64)
+    small = np.flatnonzero(q < 1.0)
+    large = np.flatnonzero(q >= 1.0)
+    while small.size and large.size:
+        deficit = 1.0 - q[small]
+        start = np.cumsum(deficit) - deficit        # début du déficit de chaque petite case
+        surplus_end = np.cumsum(q[large] - 1.0)     # fin de l'excédent de chaque grande case
+        k = np.searchsorted(surplus_end, start, side='right')
+        done = k < len(large)
+        if not done.any():
+            break
+        s, donor = small[done], large[k[done]]
+        prob[s], alias[s] = q[s], donor
+        np.subtract.at(q, donor, deficit[done])
+        touched = np.unique(donor)
+        small = np.concatenate([small[~done], touched[q[touched] < 1.0]])
+        large = np.concatenate([np.setdiff1d(large, touched, assume_unique=True), touched[q[touched] >= 1.0]])
+    # cases restantes : erreurs d'arrondi, probabilité 1
+    prob[small] = 1.0
+    prob[large] = 1.0
+    return prob, alias
+
+
+class AliasTable:
+    #weights : poids positifs des n adresses, vecteur (n,) ou tableau (H, n) d'un profil horaire
+    #          (heure h de la simulation = (t // 60) % H, même convention que rate_profile dans sample_calls)
+    def __init__(self, weights):
+        w = np.asarray(weights, dtype=float)
+        if w.ndim == 1:
+            w = w[None, :]
+        if w.ndim != 2 or w.shape[1] == 0:
+            raise ValueError("Poids de demande : vecteur (n,) ou tableau (heures, n) attendu")
+        if not np.all(np.isfinite(w)) or np.any(w < 0):
+            raise ValueError("Poids de demande : valeurs finies et positives attendues")
+        empty = np.flatnonzero(w.sum(axis=1) <= 0)
+        if empty.size:
+            raise ValueError(f"Poids de demande tous nuls pour l'heure/les heures : {', '.join(map(str, empty))}")
+        self.n_hours, self.n = w.shape
+        self.weights = w / w.sum(axis=1, keepdims=True)   #probabilités normalisées (H, n)
+        tables = [_build_alias(row) for row in w]
+        self.prob = np.array([t[0] for t in tables])
+        self.alias = np.array([t[1] for t in tables])
+
+    #size adresses tirées (un entier si size vaut None)
+    #t : instant(s) des appels (minutes), pour choisir la table de l'heure correspondante
+    def sample(self, rng, size=None, t=None):
+        i = rng.integers(self.n, size=size)
+        u = rng.random(size=size)
+        h = 0 if t is None or self.n_hours == 1 else (np.asarray(t) // 60.0).astype(np.int64) % self.n_hours
+        return np.where(u < self.prob[h, i], i, self.alias[h, i])
+
+    #probabilités moyennes sur la journée (ex. demand de hypercube_evaluate)
+    def mean_weights(self):
+        return self.weights.mean(axis=0)
@@ -0,0 +1,218 @@
+# bench_dynamic.py
+
+#Rôle global :
+# mesures de performance du module ambulances sur les instances d'exemple
+# usage : python bench_dynamic.py [solvers] [simulator] [maps] [hypercube] [loaders]
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+from build_A_dynamic import read_coords_csv, build_matrices
+
+DATA_DIR = os.path.join(current_dir, 'cvs files')
+
+# (adresses, hôpitaux, vitesse km/h) : instances d'exemple du dossier cvs files
+INSTANCES = [
+    ('200address.csv', '4hosfor200add.csv', 40),
+    ('djerba_add.csv', 'djerba_hosp.csv', 100),
+    ('test_addresses.csv', 'test_hospitals.csv', 80),
+    ('exemple2.csv', 'hosp_exemple2.csv', 150),
+    ('false_add.csv', 'false_hos.csv', 40),     # volontairement infaisable
+]
+
+
+def load_instance(addr_file, hosp_file, vmax_kmh, Tmax_min=10):
+    addrs = read_coords_csv(os.path.join(DATA_DIR, addr_file))
+    hospitals = read_coords_csv(os.path.join(DATA_DIR, hosp_file))
+    return addrs, hospitals, build_matrices(addrs, hospitals, vmax_kmh, Tmax_min)
+
+
+#temps de construction et de résolution par backend (Gurobi, HiGHS, CBC) sur chaque instance
+#compare aussi le nombre total d'ambulances renvoyé par chaque backend (départage de empty_penalty, sans garantie
+#au-delà de l'écart d'optimalité par défaut des solveurs)
+#renvoie la liste des instances où les totaux diffèrent
+def bench_solvers(repeat=3):
+    from solver_dynamic import solve_dynamic_expected, available_backends
+    backends = available_backends()
+    mismatches = []
+    print(f"{'instance':<22}{'backend':<8}{'build (ms)':>12}{'solve (ms)':>12}  solution")
+    cases = []
+    for addr_file, hosp_file, vmax in INSTANCES:
+        _, hospitals, (A, _, _) = load_instance(addr_file, hosp_file, vmax)
+        cases.append((addr_file, A, [0.1] * len(hospitals), 1e6))
+    # instance synthétique à optimums multiples (x[j] = 1 ou e[j] = 1 à coût égal sans départage)
+    rng = np.random.default_rng(0)
+    A, _, _ = build_matrices(rng.uniform([36.70, 10.00], [36.95, 10.35], size=(3000, 2)),
+                             rng.uniform([36.70, 10.00], [36.95, 10.35], size=(60, 2)), 40, 10)
+    cases.append(('synthétique 3000x60', A, [0.3] * 60, None))
+    for addr_file, A, p, budget in cases:
+        totals = {}
+        for backend in backends:
+            builds, solves = [], []
+            for _ in range(repeat):
+                stats = {}
+                x_sol, total = solve_dynamic_expected(A, p, budget=budget, cost_per_amb=1e5,
+                                                      backend=backend, stats=stats)
+                builds.append(stats['build_time']); solves.append(stats['solve_time'])
+            print(f"{addr_file:<22}{backend:<8}{1e3 * np.median(builds):>12.2f}{1e3 * np.median(solves):>12.2f}  "
+                  f"{x_sol} ({total})")
+            totals[backend] = total
+        if len(set(totals.values())) > 1:
+            mismatches.append(addr_file)
+            print(f"⚠ {addr_file} : totaux différents selon le backend {totals}")
+    print("Totaux identiques pour tous les backends" if not mismatches
+          else f"⚠ Totaux différents sur {len(mismatches)} instance(s) : {', '.join(mismatches)}")
+    return mismatches
+
+
+#débit du moteur de simulation (événements traités par seconde) pour n_calls appels
+#instance synthétique : n_addr adresses, m hôpitaux de x_per_hop ambulances, charge modérée
+def bench_simulator(n_calls=1_000_000, n_addr=2000, m=50, x_per_hop=3, seed=0):
+    from simulator import Simulator
+    rng = np.random.default_rng(seed)
+    addrs = rng.uniform([36.70, 10.00], [36.95, 10.35], size=(n_addr, 2))
+    hospitals = rng.uniform([36.70, 10.00], [36.95, 10.35], size=(m, 2))
+    A, dist, times = build_matrices(addrs, hospitals, 40, 10)
+    rate = 1.0                      # appels par minute
+    horizon = n_calls / rate        # minutes
+    sim = Simulator(A, dist, times, [x_per_hop] * m, seed=seed)
+    t0 = time.perf_counter()
+    sim.generate_arrival(rate, horizon)
+    t1 = time.perf_counter()
+    n_events = 0
+    while sim.step():
+        n_events += 1
+    t2 = time.perf_counter()
+    print(f"{n_calls} appels : génération {t1 - t0:.2f} s, {n_events} événements en {t2 - t1:.2f} s "
+          f"=> {n_events / (t2 - t1):,.0f} événements/s")
+
+
+#export de carte (create_map) par mode : durée et taille du fichier HTML
+#chaque jeu d'adresses du dossier cvs files est agrandi à n points par tirage avec bruit (~300 m) autour des originaux
+def bench_maps(sizes=(200, 2_000, 20_000, 200_000), modes=('markers', 'fast', 'geojson', 'grid'), seed=0):
+    import tempfile
+    from map_utils import create_map
+    from build_A_dynamic import coverage_radius_km
+    rng = np.random.default_rng(seed)
+    print(f"{'instance':<22}{'n':>9}{'mode':>9}{'durée (s)':>11}{'taille (Ko)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for addr_file, hosp_file, vmax in INSTANCES[:4]:
+            base = np.asarray(read_coords_csv(os.path.join(DATA_DIR, addr_file)))
+            hospitals = read_coords_csv(os.path.join(DATA_DIR, hosp_file))
+            x = [1] * len(hospitals)
+            for n in sizes:
+                addrs = base[rng.integers(len(base), size=n)] + rng.normal(0, 0.003, size=(n, 2))
+                for mode in modes:
+                    if mode == 'markers' and n > 2_000:
+                        continue   # ~40 s et 22 Mo dès 20 000 adresses, illisible pour le navigateur
+                    path = os.path.join(tmp, 'map.html')
+                    t0 = time.perf_counter()
+                    create_map(addrs, hospitals, x, mapfile=path, mode=mode, heatmap=True,
+                               coverage_km=coverage_radius_km(vmax, 10))
+                    print(f"{addr_file:<22}{n:>9}{mode:>9}{time.perf_counter() - t0:>11.2f}"
+                          f"{os.path.getsize(path) / 1024:>13.0f}")
+
+
+#évaluation hypercube sur instances synthétiques : itérations, durée, couverture attendue
+#vérifie la convergence et la finitude des p, en forte charge (5000 x 100, 3 ambulances par hôpital, 10 appels/min)
+#comme pour une grande flotte peu chargée (2000 x 10, 30 ambulances par hôpital, 0.5 appel/min)
+#renvoie la liste des cas en échec
+def bench_hypercube(seed=0):
+    from hypercube import hypercube_evaluate
+    rng = np.random.default_rng(seed)
+    cases = [('forte charge', 5000, 100, 10, 3, 10.0), ('charge modérée', 5000, 100, 10, 3, 1.0),
+             ('grande flotte', 2000, 10, 30, 30, 0.5)]
+    failures = []
+    print(f"{'cas':<16}{'n x m':>12}{'N':>6}{'appels/min':>12}{'itérations':>12}{'durée (s)':>11}  couverture")
+    for name, n, m, Tmax, x_per_hop, rate in cases:
+        A, _, times = build_matrices(rng.uniform([36.70, 10.00], [36.95, 10.35], size=(n, 2)),
+                                     rng.uniform([36.70, 10.00], [36.95, 10.35], size=(m, 2)), 40, Tmax)
+        t0 = time.perf_counter()
+        res = hypercube_evaluate(A, times, [x_per_hop] * m, rate)
+        print(f"{name:<16}{f'{n} x {m}':>12}{x_per_hop * m:>6}{rate:>12g}{res['iterations']:>12}"
+              f"{time.perf_counter() - t0:>11.2f}  {res['coverage']:.1%}")
+        if not res['converged'] or not np.all(np.isfinite(res['p'])):
+            failures.append(name)
+            print(f"⚠ {name} : {'p non finis' if not np.all(np.isfinite(res['p'])) else 'non convergé'}")
+    print("Évaluations convergées" if not failures else f"⚠ Échec sur : {', '.join(failures)}")
+    return failures
+
+
+#lecture des coordonnées : read_coords_arrays (fichier complet) et iter_coords_chunks (par blocs) sur n adresses
+#vérifie aussi que read_coords_csv, read_coords_arrays et iter_coords_chunks (blocs de 1 à 1000 lignes) donnent
+#le même résultat, et read_address_weights des poids alignés, sur un fichier avec lignes vides en tête, au milieu
+#et en fin ; et qu'une ligne invalide y est signalée avec son numéro de ligne dans le fichier
+#renvoie la liste des vérifications en échec
+def bench_loaders(n=1_000_000, seed=0):
+    import tempfile
+    import pandas as pd
+    from build_A_dynamic import read_coords_arrays, iter_coords_chunks, read_address_weights
+    rng = np.random.default_rng(seed)
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'blank.csv')
+        with open(path, 'w') as f:
+            f.write('\n\na1,36.80,10.10,2\na2,36.81,10.11,0.5\n\n\na3,36.82,10.12,1\n\na4,36.83,10.13,3\n\n')
+        try:
+            ids, lat, lon = read_coords_arrays(path)
+            ref = list(zip(lat.tolist(), lon.tolist()))
+            if list(ids) != ['a1', 'a2', 'a3', 'a4'] or read_coords_csv(path) != ref:
+                failures.append('read_coords_arrays / read_coords_csv')
+            for chunksize in (1, 2, 3, 5, 1000):
+                chunks = list(iter_coords_chunks(path, chunksize))
+                got = [(a, b) for _, la, lo in chunks for a, b in zip(la.tolist(), lo.tolist())]
+                if got != ref or [i for c in chunks for i in c[0]] != list(ids):
+                    failures.append(f'iter_coords_chunks({chunksize})')
+            if not np.array_equal(read_address_weights(path), [2, 0.5, 1, 3]):
+                failures.append('read_address_weights')
+        except ValueError as e:
+            failures.append(f'lignes vides refusées ({e})')
+        bad = os.path.join(tmp, 'bad.csv')
+        with open(bad, 'w') as f:
+            f.write('\n\na1,36.80,10.10,1\n\na2,96.00,10.11,-1\n')
+        for name, load in (('read_coords_arrays', read_coords_arrays),
+                           ('iter_coords_chunks', lambda q: list(iter_coords_chunks(q, 2))),
+                           ('read_address_weights', read_address_weights)):
+            try:
+                load(bad)
+                failures.append(f'{name} (ligne invalide acceptée)')
+            except ValueError as e:
+                if not str(e).endswith(': 5'):
+                    failures.append(f'{name} (numéro de ligne : {e})')
+
+        big = os.path.join(tmp, 'big.csv')
+        coords = rng.uniform([36.70, 10.00], [36.95, 10.35], size=(n, 2))
+        pd.DataFrame({'id': np.arange(n), 'lat': coords[:, 0], 'lon': coords[:, 1]}).to_csv(big, header=False,
+                                                                                         index=False)
+        for name, load in (('read_coords_arrays', read_coords_arrays),
+                           ('iter_coords_chunks', lambda q: sum(len(c[0]) for c in iter_coords_chunks(q)))):
+            t0 = time.perf_counter()
+            load(big)
+            print(f"{name:<22}{n:>10} adresses {time.perf_counter() - t0:>8.2f} s")
+    print("Chargeurs cohérents" if not failures else f"⚠ Échec sur : {', '.join(failures)}")
+    return failures
+
+
+BENCHES = {'solvers': bench_solvers, 'simulator': bench_simulator, 'maps': bench_maps, 'hypercube': bench_hypercube,
+           'loaders': bench_loaders}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks du module ambulances')
+    parser.add_argument('bench', nargs='*', help=f"benchmarks à lancer parmi {', '.join(BENCHES)} (défaut : tous)")
+    args = parser.parse_args()
+    unknown = [name for name in args.bench if name not in BENCHES]
+    if unknown:
+        parser.error(f"benchmark inconnu: {', '.join(unknown)}")
+    for name in args.bench or BENCHES:
+        print(f"=== {name} ===")
+        t0 = time.perf_counter()
+        BENCHES[name]()
+        print(f"({time.perf_counter() - t0:.1f} s)")
@@ -3,9 +3,13 @@
 #Rôle global :
 # transforme des coordonnées GPS brutes (Latitude/Longitude) en matrices mathématiques exploitables 
 
+import io
+from itertools import islice
 import numpy as np           #pour les calculs matriciels
 import pandas as pd          #pour la lecture des fichiers CSV
-from math import radians, sin, cos, sqrt, atan2
+from math import radians, sin, cos, sqrt, atan2, pi
+from scipy.sparse import csr_matrix, issparse, hstack, vstack   #matrices creuses (mode sparse)
+from scipy.spatial import cKDTree     #index spatial sur les hôpitaux
 R = 6371.0  # rayon de la Terre en km
 
 
@@ -20,38 +24,298 @@ def haversine_km(lat1, lon1, lat2, lon2):
 
 
 
-#charge les données 
+#convertit un bloc brut (id, lat, lon) en tableaux float64 contigus et valide les plages
+#first_line : numéro de ligne (1-based) du premier enregistrement du bloc dans le fichier
+#lines : numéros de ligne de chaque enregistrement, si le bloc n'est pas contigu (lignes vides retirées)
+def _parse_coords_frame(df, first_line, path, lines=None):
+    lines = np.arange(first_line, first_line + len(df)) if lines is None else lines
+    raw_lat = pd.to_numeric(df.iloc[:, 1], errors='coerce').to_numpy(dtype=np.float64)
+    raw_lon = pd.to_numeric(df.iloc[:, 2], errors='coerce').to_numpy(dtype=np.float64)
+    # lignes vides (les 3 champs absents) : ignorées sans erreur
+    blank = df.iloc[:, 0].isna().to_numpy() & df.iloc[:, 1].isna().to_numpy() & df.iloc[:, 2].isna().to_numpy()
+    # validation vectorielle : valeurs non numériques ou hors plage
+    with np.errstate(invalid='ignore'):
+        bad = ~blank & ~((np.abs(raw_lat) <= 90.0) & (np.abs(raw_lon) <= 180.0))
+    if bad.any():
+        bad_lines = lines[bad]
+        shown = ', '.join(str(k) for k in bad_lines[:10]) + (' ...' if len(bad_lines) > 10 else '')
+        raise ValueError(f"{path}: {len(bad_lines)} ligne(s) invalide(s) (lat dans [-90,90], lon dans [-180,180]) : {shown}")
+    keep = ~blank
+    ids = df.iloc[:, 0].to_numpy()[keep].astype(str)
+    ids = np.char.strip(ids)
+    return ids, np.ascontiguousarray(raw_lat[keep]), np.ascontiguousarray(raw_lon[keep])
+
+
+
+#retire les lignes vides d'une liste de lignes brutes (pandas ne sait pas les sauter sans perdre les numéros de ligne)
+#first_line : numéro de ligne (1-based) de raw[0] dans le fichier
+#renvoie (texte des lignes gardées, numéros de ligne de chacune dans le fichier)
+def _drop_blank_lines(raw, first_line=1):
+    kept = [k for k, line in enumerate(raw) if line.strip('\r\n')]
+    return ''.join(raw[k] for k in kept), first_line + np.asarray(kept, dtype=np.int64)
+
+
+
+#contenu complet du fichier sans ses lignes vides : renvoie (texte, numéros de ligne des enregistrements)
+#(le découpage en lignes n'est fait que si le fichier contient effectivement des lignes vides)
+def _read_nonblank(path):
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    if text.startswith('\n') or '\n\n' in text:
+        return _drop_blank_lines(io.StringIO(text).readlines())
+    return text, 1 + np.arange(text.count('\n') + (not text.endswith('\n')) if text else 0, dtype=np.int64)
+
+
+
+#générateur par blocs : lit le fichier par morceaux de chunksize lignes
+#et renvoie (ids, lat, lon) pour chaque bloc, sans jamais charger le fichier complet
+#le découpage est fait ici et non par pandas (chunksize) : un bloc qui commence par des lignes vides,
+#ou n'en contient que, ferait échouer le lecteur de pandas ; les lignes vides sont retirées avant l'analyse
+#(un bloc entièrement vide est sauté) et les numéros de ligne des erreurs restent ceux du fichier
+def iter_coords_chunks(path, chunksize=100000):
+    chunksize = max(1, int(chunksize))
+    first_line = 1
+    with open(path, encoding='utf-8') as f:
+        while True:
+            raw = list(islice(f, chunksize))
+            if not raw:
+                break
+            text, lines = _drop_blank_lines(raw, first_line)
+            if len(lines):
+                try:
+                    df = pd.read_csv(io.StringIO(text), header=None, usecols=[0, 1, 2], dtype={0: str})
+                except ValueError:
+                    raise ValueError('CSV doit avoir au moins 3 colonnes: id, lat, lon')
+                yield _parse_coords_frame(df, first_line, path, lines)
+            first_line += len(raw)
+
+
+
+#charge le fichier complet dans trois tableaux contigus : ids (str), lat, lon (float64)
+#lignes vides retirées comme dans iter_coords_chunks (y compris en tête de fichier), numéros de ligne conservés
+def read_coords_arrays(path):
+    text, lines = _read_nonblank(path)
+    try:
+        df = pd.read_csv(io.StringIO(text), header=None, usecols=[0, 1, 2], dtype={0: str})
+    except ValueError:
+        raise ValueError('CSV doit avoir au moins 3 colonnes: id, lat, lon')
+    return _parse_coords_frame(df, 1, path, lines)
+
+
+
+#poids de demande optionnels des adresses : colonnes situées après id, lat, lon
+#1 colonne -> tableau (n,) ; k colonnes (ex. 24, une par heure) -> tableau (k, n) ; aucune -> None
+#(même filtrage des lignes vides que read_coords_arrays, les poids sont donc alignés sur les adresses)
+def read_address_weights(path):
+    text, lines = _read_nonblank(path)
+    df = pd.read_csv(io.StringIO(text), header=None, dtype={0: str})
+    if df.shape[1] <= 3:
+        return None
+    blank = df.iloc[:, :3].isna().all(axis=1).to_numpy()
+    w = df.iloc[:, 3:].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        bad = ~blank & ~np.all(np.isfinite(w) & (w >= 0), axis=1)
+    if bad.any():
+        bad_lines = lines[bad]
+        shown = ', '.join(str(k) for k in bad_lines[:10]) + (' ...' if len(bad_lines) > 10 else '')
+        raise ValueError(f"{path}: {len(bad_lines)} poids invalide(s) (valeurs positives attendues) : {shown}")
+    w = w[~blank]
+    return np.ascontiguousarray(w[:, 0] if w.shape[1] == 1 else w.T)
+
+
+
+#charge les données
 #et extrait les coordonnées GPS sous forme de liste.
 def read_coords_csv(path):
-    df = pd.read_csv(path, header=None)
-    if df.shape[1] >= 3:
-       coords = [(float(r[1]), float(r[2])) for _, r in df.iterrows()] # liste de tuples (lat, lon)
-    else:
-        raise ValueError('CSV doit avoir au moins 3 colonnes: id, lat, lon')
+    _, lat, lon = read_coords_arrays(path)
+    coords = list(zip(lat.tolist(), lon.tolist())) # liste de tuples (lat, lon)
     return coords
 
 
 
+#version vectorisée de haversine_km (broadcast NumPy)
+#accepte des scalaires ou des tableaux, même ordre d'opérations que la version scalaire
+def haversine_km_np(lat1, lon1, lat2, lon2):
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat/2)**2 + np.cos(np.radians(lat1))*np.cos(np.radians(lat2))*np.sin(dlon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    return R * c
+
+
 
 #construit les matrices A, dist, times
-def build_matrices(addrs, hospitals, vmax_kmh=40, Tmax_min=10):
+# block_size : nombre d'adresses traitées par bloc (borne la mémoire temporaire à block_size x m)
+# dtype : type des matrices dist/times en sortie (float64 par défaut, float32 pour diviser la mémoire par 2)
+# le calcul est toujours fait en float64, A est donc identique quel que soit dtype
+# sparse=True : délègue à build_sparse_matrices (A, dist, times en CSR)
+# progress : callback optionnel appelé après chaque bloc, cf. _report_block
+def build_matrices(addrs, hospitals, vmax_kmh=40, Tmax_min=10, block_size=4096, dtype=float, sparse=False,
+                   progress=None):
+    if sparse:
+        return build_sparse_matrices(addrs, hospitals, vmax_kmh, Tmax_min, block_size, dtype, progress)
+    addrs = np.asarray(addrs, dtype=float).reshape(-1, 2)
+    hospitals = np.asarray(hospitals, dtype=float).reshape(-1, 2)
     n = len(addrs)  #nombre d'adresses
     m = len(hospitals)   #nombre d'hôpitaux
-    dist = np.zeros((n,m), dtype=float) # matrice des distances en km
-    times = np.zeros((n,m), dtype=float)  # matrice des temps en minutes
+    dist = np.zeros((n,m), dtype=dtype) # matrice des distances en km
+    times = np.zeros((n,m), dtype=dtype)  # matrice des temps en minutes
     A = np.zeros((n,m), dtype=int)    # matrice de couverture binaire
-    for i,(la,lo) in enumerate(addrs):
-      for j,(hs_la,hs_lo) in enumerate(hospitals):
-         d = haversine_km(la, lo, hs_la, hs_lo)
-         t = (d / vmax_kmh) * 60.0  # temps en minutes
-         dist[i,j] = d
-         times[i,j] = t
-         A[i,j] = 1 if t <= Tmax_min else 0
+    hs_la = hospitals[:, 0][None, :]
+    hs_lo = hospitals[:, 1][None, :]
+    block_size = max(1, int(block_size))
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        la = addrs[start:stop, 0][:, None]
+        lo = addrs[start:stop, 1][:, None]
+        d = haversine_km_np(la, lo, hs_la, hs_lo)
+        t = (d / vmax_kmh) * 60.0  # temps en minutes
+        dist[start:stop] = d
+        times[start:stop] = t
+        A[start:stop] = t <= Tmax_min
+        _report_block(progress, stop, n)
+    return A, dist, times
+
+
+
+
+#avancement de la construction par blocs : progress(adresses traitées, total) après chaque bloc
+#si le callback renvoie True, la construction est abandonnée (InterruptedError, rien n'est renvoyé)
+def _report_block(progress, done, total):
+    if progress is not None and progress(done, total):
+        raise InterruptedError("Construction des matrices interrompue")
+
+
+#rayon de couverture en km : distance maximale parcourue en Tmax à la vitesse vmax
+def coverage_radius_km(vmax_kmh, Tmax_min):
+    return vmax_kmh * Tmax_min / 60.0
+
+
+
+#projette des coordonnées (lat, lon) en degrés sur la sphère unité (x, y, z)
+#la distance euclidienne (corde) y est une fonction croissante de la distance haversine
+def unit_xyz(coords):
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    la = np.radians(coords[:, 0])
+    lo = np.radians(coords[:, 1])
+    return np.column_stack((np.cos(la)*np.cos(lo), np.cos(la)*np.sin(lo), np.sin(la)))
+
+
+
+#construit A, dist, times sous forme creuse (CSR) : seuls les couples atteignables en Tmax sont stockés
+#1) rayon de couverture (grand cercle) déduit de vmax et Tmax
+#2) recherche des hôpitaux dans ce rayon via un KD-tree sur la sphère unité (rayon en corde, avec marge)
+#3) filtre exact avec haversine_km_np, comme la version dense
+#les trois matrices partagent la même structure (mêmes indices de colonnes par ligne)
+def build_sparse_matrices(addrs, hospitals, vmax_kmh=40, Tmax_min=10, block_size=65536, dtype=float, progress=None):
+    addrs = np.asarray(addrs, dtype=float).reshape(-1, 2)
+    hospitals = np.asarray(hospitals, dtype=float).reshape(-1, 2)
+    n = len(addrs)
+    m = len(hospitals)
+    radius = coverage_radius_km(vmax_kmh, Tmax_min)
+    # corde équivalente (conservative : légèrement agrandie pour ne perdre aucun couple)
+    chord = 2 * sin(min(radius / R, pi) / 2) * (1 + 1e-9) + 1e-12
+    tree = cKDTree(unit_xyz(hospitals)) if m > 0 else None
+    rows, cols, dists = [], [], []
+    block_size = max(1, int(block_size))
+    for start in range(0, n if tree is not None else 0, block_size):
+        stop = min(start + block_size, n)
+        hits = tree.query_ball_point(unit_xyz(addrs[start:stop]), chord)
+        counts = np.fromiter((len(h) for h in hits), dtype=np.int64, count=len(hits))
+        if counts.sum() == 0:
+            _report_block(progress, stop, n)
+            continue
+        i = np.repeat(np.arange(start, stop), counts)
+        j = np.concatenate([np.asarray(h, dtype=np.int64) for h in hits])
+        d = haversine_km_np(addrs[i, 0], addrs[i, 1], hospitals[j, 0], hospitals[j, 1])
+        keep = (d / vmax_kmh) * 60.0 <= Tmax_min   # même test que la version dense
+        rows.append(i[keep]); cols.append(j[keep]); dists.append(d[keep])
+        _report_block(progress, stop, n)
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    d = np.concatenate(dists) if dists else np.zeros(0)
+    order = np.lexsort((cols, rows))   # indices triés par ligne puis par colonne
+    rows, cols, d = rows[order], cols[order], d[order]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    # construction directe (data, indices, indptr) : conserve les temps nuls (adresse sur l'hôpital)
+    A = csr_matrix((np.ones(len(cols), dtype=np.int8), cols, indptr), shape=(n, m))
+    dist = csr_matrix((d.astype(dtype), cols, indptr), shape=(n, m))
+    times = csr_matrix((((d / vmax_kmh) * 60.0).astype(dtype), cols, indptr), shape=(n, m))
     return A, dist, times
 
 
 
 
+#mises à jour incrémentales : on ne calcule que les nouveaux couples adresse-hôpital
+#A, dist, times peuvent être denses (y compris memmap d'un magasin) ou creuses (CSR)
+#le résultat est un nouveau triplet (A, dist, times) du même type, à re-sauvegarder si besoin
+
+#concatène deux triplets (A, dist, times) horizontalement (axis=1) ou verticalement (axis=0)
+def _stack_matrices(old, new, axis):
+    if issparse(old[0]):
+        stack = hstack if axis == 1 else vstack
+        return tuple(csr_matrix(stack([o, n.astype(o.dtype)], format='csr')) for o, n in zip(old, new))
+    return tuple(np.concatenate([np.asarray(o), np.asarray(n, dtype=o.dtype)], axis=axis) for o, n in zip(old, new))
+
+
+#supprime des lignes (axis=0) ou des colonnes (axis=1) d'un triplet (A, dist, times)
+def _drop_matrices(mats, idx, axis):
+    keep = np.ones(mats[0].shape[axis], dtype=bool)
+    keep[np.asarray(idx, dtype=int)] = False
+    if issparse(mats[0]):
+        return tuple(csr_matrix(M)[keep] if axis == 0 else csr_matrix(M)[:, keep] for M in mats)
+    return tuple(np.compress(keep, np.asarray(M), axis=axis) for M in mats)
+
+
+#ajoute des hôpitaux : n x k nouveaux couples au lieu de n x (m+k)
+def add_hospitals(A, dist, times, addrs, new_hospitals, vmax_kmh=40, Tmax_min=10, block_size=4096):
+    new = build_matrices(addrs, new_hospitals, vmax_kmh, Tmax_min, block_size,
+                         dtype=dist.dtype, sparse=issparse(A))
+    return _stack_matrices((A, dist, times), new, axis=1)
+
+
+#retire les hôpitaux d'indices idx (les colonnes suivantes sont décalées)
+def remove_hospitals(A, dist, times, idx):
+    return _drop_matrices((A, dist, times), idx, axis=1)
+
+
+#ajoute des adresses : k x m nouveaux couples
+def add_addresses(A, dist, times, hospitals, new_addrs, vmax_kmh=40, Tmax_min=10, block_size=4096):
+    new = build_matrices(new_addrs, hospitals, vmax_kmh, Tmax_min, block_size,
+                         dtype=dist.dtype, sparse=issparse(A))
+    return _stack_matrices((A, dist, times), new, axis=0)
+
+
+#retire les adresses d'indices idx (les lignes suivantes sont décalées)
+def remove_addresses(A, dist, times, idx):
+    return _drop_matrices((A, dist, times), idx, axis=0)
+
+
+
+
+#résumé de A pour l'affichage des grandes matrices : part des couples couverts par bloc d'adresses x bloc d'hôpitaux
+#(au plus max_rows x max_cols blocs de tailles quasi égales) ; A dense ou creuse
+def coverage_density(A, max_rows=200, max_cols=200):
+    n, m = A.shape
+    row_edges = np.linspace(0, n, min(n, max_rows) + 1).astype(np.int64)
+    col_edges = np.linspace(0, m, min(m, max_cols) + 1).astype(np.int64)
+    if n == 0 or m == 0:
+        return np.zeros((len(row_edges) - 1, len(col_edges) - 1))
+    if issparse(A):
+        A = csr_matrix(A)
+        row_bin = np.repeat(np.arange(len(row_edges) - 1), np.diff(row_edges))
+        col_bin = np.repeat(np.arange(len(col_edges) - 1), np.diff(col_edges))
+        R_ind = csr_matrix((np.ones(n, dtype=np.int64), (row_bin, np.arange(n))), shape=(len(row_edges) - 1, n))
+        C_ind = csr_matrix((np.ones(m, dtype=np.int64), (np.arange(m), col_bin)), shape=(m, len(col_edges) - 1))
+        counts = (R_ind @ (A != 0).astype(np.int64) @ C_ind).toarray()
+    else:
+        counts = np.add.reduceat(np.asarray(A) != 0, row_edges[:-1], axis=0, dtype=np.int64)
+        counts = np.add.reduceat(counts, col_edges[:-1], axis=1)
+    return counts / np.outer(np.diff(row_edges), np.diff(col_edges))
+
+
+
 def save_matrices(A, dist, times, prefix='output'):   #sauvegarde les matrices dans des fichiers CSV
     np.savetxt(f'{prefix}_A.csv', A, fmt='%d', delimiter=',')
     np.savetxt(f'{prefix}_dist.csv', dist, fmt='%.6f', delimiter=',')
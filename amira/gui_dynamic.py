@@ -9,8 +9,9 @@ from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QFileDialog, QTextEdit, QSpinBox,
                              QProgressBar, QTableWidget, QTableWidgetItem, QHeaderView,
                              QMessageBox, QSplitter, QTabWidget, QAbstractItemView, QDoubleSpinBox,
-                             QMainWindow)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+                             QMainWindow, QSlider, QTableView, QCheckBox)
+from PyQt6.QtCore import (Qt, QThread, QObject, QTimer, QElapsedTimer, pyqtSignal,
+                          QAbstractTableModel, QModelIndex)
 from PyQt6.QtGui import QColor, QFont
 
 # --- 2. INTÉGRATION DE MATPLOTLIB (GRAPHIQUES) ---
@@ -28,17 +29,34 @@ if current_dir not in sys.path:
 ERROR_MSG = None
 try:
     # Importation de VOTRE logique métier
-    from build_A_dynamic import read_coords_csv, build_matrices
-    from solver_dynamic import solve_dynamic_expected
+    from build_A_dynamic import (read_coords_csv, read_address_weights, build_matrices, coverage_radius_km,
+                                 coverage_density)
+    from solver_dynamic import solve_dynamic_expected, sweep_budget
     from simulator import Simulator
+    from mission_log import fleet_state, ARRIVAL, COMPLETION
     from map_utils import create_map
+    from matrix_store import save_matrix_store, load_matrix_store, stale_sources, MatrixCache
+    from hypercube import fixed_point_allocation
+    from road_network import load_road_graph
 except ImportError as err:
     ERROR_MSG = str(err)
     def read_coords_csv(*args): raise ImportError(ERROR_MSG)
+    def read_address_weights(*args): raise ImportError(ERROR_MSG)
     def build_matrices(*args): raise ImportError(ERROR_MSG)
+    def coverage_radius_km(*args): raise ImportError(ERROR_MSG)
+    def coverage_density(*args, **kwargs): raise ImportError(ERROR_MSG)
     def solve_dynamic_expected(*args): raise ImportError(ERROR_MSG)
-    def Simulator(*args): raise ImportError(ERROR_MSG)
-    def create_map(*args): raise ImportError(ERROR_MSG)
+    def sweep_budget(*args, **kwargs): raise ImportError(ERROR_MSG)
+    def Simulator(*args, **kwargs): raise ImportError(ERROR_MSG)
+    def fleet_state(*args): raise ImportError(ERROR_MSG)
+    ARRIVAL, COMPLETION = 0, 1
+    def create_map(*args, **kwargs): raise ImportError(ERROR_MSG)
+    def save_matrix_store(*args, **kwargs): raise ImportError(ERROR_MSG)
+    def load_matrix_store(*args, **kwargs): raise ImportError(ERROR_MSG)
+    def stale_sources(*args): raise ImportError(ERROR_MSG)
+    def MatrixCache(*args, **kwargs): raise ImportError(ERROR_MSG)
+    def fixed_point_allocation(*args, **kwargs): raise ImportError(ERROR_MSG)
+    def load_road_graph(*args): raise ImportError(ERROR_MSG)
 
 # --- 4. FEUILLE DE STYLE (CSS) ---
 STYLE = """
@@ -48,7 +66,7 @@ QPushButton:hover { background-color: #34495e; }
 QPushButton:disabled { background-color: #bdc3c7; color: #7f8c8d; }
 QPushButton#danger { background-color: #e74c3c; }
 QPushButton#success { background-color: #27ae60; }
-QTableWidget { border: 1px solid #bdc3c7; background-color: #ecf0f1; selection-background-color: #3498db; gridline-color: #bdc3c7; }
+QTableView { border: 1px solid #bdc3c7; background-color: #ecf0f1; selection-background-color: #3498db; gridline-color: #bdc3c7; }
 QHeaderView::section { background-color: #2c3e50; color: white; padding: 5px; border: 1px solid #34495e; font-weight: bold; }
 QTabWidget::pane { border: 1px solid #bdc3c7; top: -1px; }
 QTabBar::tab { background: #bdc3c7; padding: 8px 20px; border-top-left-radius: 4px; border-top-right-radius: 4px; }
@@ -66,11 +84,51 @@ class MplCanvas(FigureCanvas):
         self.ax.grid(True, linestyle=':', alpha=0.6)
         super(MplCanvas, self).__init__(self.fig)
 
+# --- CLASSE 1 bis : LA MATRICE A (MODÈLE / VUE) ---
+# Modèle Qt lisant directement la matrice (NumPy dense, memmap ou CSR) : aucun objet par cellule,
+# la vue (QTableView) ne demande que les cellules visibles. Une ligne de A est mise en cache,
+# car Qt interroge chaque cellule pour plusieurs rôles (texte, couleurs, alignement).
+class CoverageTableModel(QAbstractTableModel):
+    COVERED_BG, COVERED_FG = QColor("#2ecc71"), QColor("white")
+    EMPTY_BG, EMPTY_FG = QColor("#ecf0f1"), QColor("#95a5a6")
+
+    def __init__(self, A, parent=None):
+        super().__init__(parent)
+        self.A = A
+        self._row_idx, self._row = -1, None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.A.shape[0]
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.A.shape[1]
+
+    def _value(self, i, j):
+        if i != self._row_idx:
+            row = self.A[i]
+            self._row = row.toarray().ravel() if hasattr(row, 'toarray') else np.asarray(row).ravel()
+            self._row_idx = i
+        return int(self._row[j])
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        if role == Qt.ItemDataRole.TextAlignmentRole: return Qt.AlignmentFlag.AlignCenter
+        val = self._value(index.row(), index.column())
+        if role == Qt.ItemDataRole.DisplayRole: return str(val)
+        if role == Qt.ItemDataRole.BackgroundRole: return self.COVERED_BG if val == 1 else self.EMPTY_BG
+        if role == Qt.ItemDataRole.ForegroundRole: return self.COVERED_FG if val == 1 else self.EMPTY_FG
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole: return None
+        return f"H{section}" if orientation == Qt.Orientation.Horizontal else f"A{section}"
+
 # --- CLASSE 2 : LE MOTEUR ASYNCHRONE (THREAD) ---
+# La simulation tourne à pleine vitesse et écrit dans son journal (MissionLog) ;
+# l'affichage est piloté séparément par ReplayController, qui relit ce journal.
 class SimThread(QThread):
     mission_signal = pyqtSignal(object)
-    progress_signal = pyqtSignal(int, int)
-    finished_signal = pyqtSignal(list)
+    finished_signal = pyqtSignal(object)   # MissionLog (transmis par référence, sans copie)
 
     def __init__(self, sim, rate_lambda, horizon):
         super().__init__()
@@ -82,31 +140,18 @@ class SimThread(QThread):
 
     def run(self):
         try:
-            self.sim.generate_arrival(self.rate_lambda, self.horizon)
-            events = list(self.sim.event_q)
-            events.sort(key=lambda e: e[0])
-            total = len(events)
-            self.sim.event_q = events
-            processed = 0
-
+            # simulateur restauré depuis un instantané : les appels sont déjà dans la file
+            if self.sim._arrivals is None:
+                self.sim.generate_arrival(self.rate_lambda, self.horizon)
+            # la file reste un vrai tas : les fins de mission planifiées en cours de route y sont insérées en O(log n)
             while self.sim.event_q and not self._stop:
                 while self._pause and not self._stop: 
                     time.sleep(0.05)
                 
-                time_event, func, args = self.sim.event_q.pop(0)
-                self.sim.clock = time_event
-                
                 try: 
-                    func(*args)
+                    self.sim.step()
                 except Exception as e: 
                     self.mission_signal.emit({'type': 'error', 'msg': str(e)})
-                
-                if self.sim.missions_log: 
-                    self.mission_signal.emit(self.sim.missions_log[-1])
-                
-                processed += 1
-                self.progress_signal.emit(processed, total)
-                time.sleep(0.015) 
             
             self.finished_signal.emit(self.sim.missions_log)
         except Exception as e:
@@ -116,8 +161,116 @@ class SimThread(QThread):
     def pause(self): self._pause = True
     def resume(self): self._pause = False
 
+
+# --- CLASSE 2 ter : LES CALCULS LONGS (MATRICE, OPTIMISATION) ---
+# task(report) tourne hors du thread graphique : la fenêtre reste réactive pendant le calcul.
+# report(*args) est le callback d'avancement transmis à build_matrices (progress) ou à solve_dynamic_expected
+# (callback) : il émet progress_signal au plus 10 fois par seconde et renvoie True une fois l'annulation
+# demandée, ce qui interrompt le calcul (InterruptedError).
+# task ne doit pas toucher aux widgets : le résultat est traité dans le thread graphique (result_signal).
+class TaskThread(QThread):
+    progress_signal = pyqtSignal(object)   # arguments reçus par report
+    result_signal = pyqtSignal(object)
+    error_signal = pyqtSignal(str)
+    cancelled_signal = pyqtSignal()
+
+    def __init__(self, task):
+        super().__init__()
+        self.task = task
+        self._cancel = False
+        self._last = 0.0
+
+    def run(self):
+        try:
+            self.result_signal.emit(self.task(self.report))
+        except InterruptedError:
+            self.cancelled_signal.emit()
+        except Exception as e:
+            self.error_signal.emit(str(e))
+
+    def report(self, *args):
+        now = time.perf_counter()
+        if now - self._last > 0.1:
+            self._last = now
+            self.progress_signal.emit(args)
+        return self._cancel
+
+    def cancel(self): self._cancel = True
+
+
+# --- CLASSE 2 bis : LA RELECTURE (REPLAY) ---
+# Relit le journal de la simulation à cadence fixe (QTimer) : à chaque image, les entrées dont l'instant
+# est compris entre l'image précédente et l'instant relu sont transmises en un seul lot.
+# speed : minutes simulées par seconde réelle ; seek : saut à un instant quelconque (état recalculé)
+# La relecture ne dépasse jamais l'horloge de la simulation tant que celle-ci n'est pas terminée.
+class ReplayController(QObject):
+    frame_signal = pyqtSignal(object, float, bool)   # (lot d'entrées du journal, instant relu, remise à zéro)
+    finished_signal = pyqtSignal()
+
+    def __init__(self, sim, horizon, speed=60.0, fps=25, parent=None):
+        super().__init__(parent)
+        self.sim = sim
+        self.horizon = horizon
+        self.speed = speed
+        self.sim_done = False
+        self.t = sim.clock
+        self.cursor = 0
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(1000 / fps))
+        self.timer.timeout.connect(self._tick)
+        self._elapsed = QElapsedTimer()
+
+    def start(self):
+        self.seek(self.t)
+        self.resume()
+
+    def pause(self): self.timer.stop()
+
+    def resume(self):
+        self._elapsed.start()
+        self.timer.start()
+
+    def is_playing(self): return self.timer.isActive()
+
+    def set_speed(self, speed): self.speed = speed
+
+    def on_sim_finished(self, *args): self.sim_done = True
+
+    #dernier instant relisible : fin du journal si la simulation est terminée, sinon son horloge
+    def end_time(self):
+        if not self.sim_done:
+            return self.sim.clock
+        times = self.sim.missions_log.view()['time']
+        return max(self.horizon, float(times[-1]) if len(times) else 0.0)
+
+    def seek(self, t):
+        self.t = min(max(t, 0.0), self.end_time())
+        self._advance(reset=True)
+
+    def _tick(self):
+        end = self.end_time()
+        self.t = min(self.t + self.speed * self._elapsed.restart() / 1000.0, end)
+        self._advance(reset=False)
+        if self.sim_done and self.t >= end:
+            self.timer.stop()
+            self.finished_signal.emit()
+
+    def _advance(self, reset):
+        view = self.sim.missions_log.view()
+        times = view['time']
+        new = int(np.searchsorted(times, self.t, side='right'))
+        if not self.sim_done:
+            # les événements à l'instant de l'horloge ne sont peut-être pas tous traités
+            new = min(new, int(np.searchsorted(times, self.sim.clock, side='left')))
+        batch = view[:new] if reset else view[self.cursor:new]
+        self.cursor = new
+        self.frame_signal.emit(batch.copy(), self.t, reset)
+
 # --- CLASSE 3 : L'INTERFACE PRINCIPALE (IHM) ---
 class MainWindow(QMainWindow): 
+    MAX_LINES = 300   # nombre maximal de missions tracées simultanément sur la carte (relecture)
+    LARGE_MATRIX = 1_000_000   # au-delà (cellules de A), on ouvre la vue résumée plutôt que le tableau
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle('Optimization Hub - Projet RO (Tmax fixe: 10min)')
@@ -134,6 +287,12 @@ class MainWindow(QMainWindow):
         self.btn_load_hops = QPushButton('🏥 2. Charger Hôpitaux')
         top_layout.addWidget(self.btn_load_addrs)
         top_layout.addWidget(self.btn_load_hops)
+        self.btn_load_road = QPushButton('🛣 Réseau Routier')
+        top_layout.addWidget(self.btn_load_road)
+        self.btn_open_store = QPushButton('📦 Ouvrir Matrice')
+        self.btn_save_store = QPushButton('💾 Sauver Matrice')
+        top_layout.addWidget(self.btn_open_store)
+        top_layout.addWidget(self.btn_save_store)
         top_layout.addStretch()
         self.btn_export_map = QPushButton('🌐 Voir Carte Web')
         self.btn_export_map.setStyleSheet("background-color: #8e44ad; color: white;")
@@ -160,6 +319,13 @@ class MainWindow(QMainWindow):
         
         params_layout.addWidget(QLabel("<b>Budget Total:</b>")); params_layout.addWidget(self.spin_budget)
         params_layout.addWidget(QLabel("<b>Coût/Amb.:</b>")); params_layout.addWidget(self.spin_cost)
+        # option : p estimés par le modèle hypercube (point fixe), avec leur propre taux d'appels ; sinon p = 0.1
+        self.chk_hypercube = QCheckBox("p hypercube")
+        self.spin_rate_hc = QSpinBox(); self.spin_rate_hc.setRange(1, 5000); self.spin_rate_hc.setValue(10)
+        self.spin_rate_hc.setSuffix(" appels/h"); self.spin_rate_hc.setEnabled(False)
+        params_layout.addWidget(self.chk_hypercube); params_layout.addWidget(self.spin_rate_hc)
+        self.btn_sweep = QPushButton('📈 Courbe Budget')
+        params_layout.addWidget(self.btn_sweep)
         
         main_layout.addLayout(params_layout)
 
@@ -172,11 +338,20 @@ class MainWindow(QMainWindow):
         self.btn_pause = QPushButton('▶ Reprendre')
         self.btn_stop = QPushButton('⏹ Stop')
         self.btn_stop.setObjectName("danger")
+        self.btn_save_state = QPushButton('💾 Sauver État')
+        self.btn_load_state = QPushButton('⏯ Reprendre État')
+        
+        self.btn_cancel = QPushButton('✖ Annuler Calcul')
+        self.btn_cancel.setObjectName("danger")
+        self.lbl_task = QLabel("")
         
-        self.btn_pause.setEnabled(False); self.btn_stop.setEnabled(False)
+        self.btn_pause.setEnabled(False); self.btn_stop.setEnabled(False); self.btn_save_state.setEnabled(False)
+        self.btn_cancel.setEnabled(False)
         
         action_layout.addWidget(self.btn_build); action_layout.addWidget(self.btn_solve)
+        action_layout.addWidget(self.btn_cancel); action_layout.addWidget(self.lbl_task)
         action_layout.addWidget(self.btn_start); action_layout.addWidget(self.btn_pause); action_layout.addWidget(self.btn_stop)
+        action_layout.addWidget(self.btn_save_state); action_layout.addWidget(self.btn_load_state)
         main_layout.addLayout(action_layout)
 
         # --- D. ZONE CENTRALE (SPLITTER) ---
@@ -186,14 +361,27 @@ class MainWindow(QMainWindow):
         left_widget = QWidget(); left_layout = QVBoxLayout(left_widget)
         self.tabs = QTabWidget()
         
-        self.table_matrix = QTableWidget()
+        self.table_matrix = QTableView()
         self.table_matrix.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        # tailles fixes : pas de mesure du contenu de chaque ligne/colonne (matrices de plusieurs millions de cellules)
+        self.table_matrix.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table_matrix.horizontalHeader().setDefaultSectionSize(48)
+        self.table_matrix.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table_matrix.verticalHeader().setDefaultSectionSize(22)
         self.tabs.addTab(self.table_matrix, "📐 Matrice A")
+
+        self.density_canvas = MplCanvas(self)
+        self.density_canvas.ax.set_title("Densité de couverture")
+        self.tabs.addTab(self.density_canvas, "🟩 Densité A")
         
         self.table_hops = QTableWidget(0, 3)
         self.table_hops.setHorizontalHeaderLabels(['Hôpital', 'Ambulances', 'Dispo Live'])
         self.table_hops.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.tabs.addTab(self.table_hops, "🚑 Résultat & Simu")
+
+        self.frontier_canvas = MplCanvas(self)
+        self.frontier_canvas.ax.set_title("Frontière Ambulances / Budget")
+        self.tabs.addTab(self.frontier_canvas, "📈 Frontière")
         
         left_layout.addWidget(self.tabs)
         
@@ -201,6 +389,17 @@ class MainWindow(QMainWindow):
         self.log = QTextEdit(); self.log.setReadOnly(True)
         left_layout.addWidget(self.log)
         self.progress = QProgressBar(); left_layout.addWidget(self.progress)
+
+        # relecture de la simulation : vitesse (minutes simulées par seconde) et position
+        replay_layout = QHBoxLayout()
+        self.spin_speed = QDoubleSpinBox(); self.spin_speed.setRange(0.1, 100000); self.spin_speed.setValue(60)
+        self.spin_speed.setSuffix(" min/s")
+        self.slider_seek = QSlider(Qt.Orientation.Horizontal); self.slider_seek.setRange(0, 1000)
+        self.slider_seek.setEnabled(False)
+        self.lbl_replay = QLabel("t = 0 min")
+        replay_layout.addWidget(QLabel("<b>Relecture :</b>")); replay_layout.addWidget(self.spin_speed)
+        replay_layout.addWidget(self.slider_seek); replay_layout.addWidget(self.lbl_replay)
+        left_layout.addLayout(replay_layout)
         
         splitter.addWidget(left_widget)
 
@@ -212,17 +411,35 @@ class MainWindow(QMainWindow):
         splitter.setSizes([600, 800])
         main_layout.addWidget(splitter)
 
-        self.addrs = []; self.hops = []; self.A = None; self.x_sol = None
+        self.addrs = []; self.hops = []; self.A = None; self.x_sol = None; self.p_sol = None
+        self.p_sol_rate = None   # taux d'appels (par minute) du point fixe ayant donné p_sol (None : p = 0.1)
+        self.addrs_path = None; self.hops_path = None; self.matrix_params = None
+        self.matrix_road = None   # empreinte du graphe routier ayant servi à construire A (None : vol d'oiseau)
+        self.addr_weights = None   # poids de demande des adresses (4e colonne et suivantes du CSV)
+        self.cache = None
+        self.road_graph = None; self.road_path = None   # graphe routier optionnel (sinon distance à vol d'oiseau)
         self.sim = None; self.sim_thread = None; self.mapfile = None; self.active_lines = {}
+        self.replay = None; self.busy_live = None
+        self.task = None; self.incumbent = None
 
         # --- CONNEXION DES SIGNAUX ---
         self.btn_load_addrs.clicked.connect(self.load_addrs)
         self.btn_load_hops.clicked.connect(self.load_hops)
+        self.btn_load_road.clicked.connect(self.load_road)
+        self.btn_open_store.clicked.connect(self.open_store)
+        self.btn_save_store.clicked.connect(self.save_store)
         self.btn_build.clicked.connect(self.build_A)
         self.btn_solve.clicked.connect(self.solve)
+        self.btn_cancel.clicked.connect(self.cancel_task)
+        self.btn_sweep.clicked.connect(self.sweep)
+        self.chk_hypercube.toggled.connect(self.spin_rate_hc.setEnabled)
         self.btn_start.clicked.connect(self.start_sim)
         self.btn_pause.clicked.connect(self.pause_sim)
         self.btn_stop.clicked.connect(self.stop_sim)
+        self.btn_save_state.clicked.connect(self.save_state)
+        self.btn_load_state.clicked.connect(self.load_state)
+        self.spin_speed.valueChanged.connect(lambda v: self.replay and self.replay.set_speed(v))
+        self.slider_seek.valueChanged.connect(self.seek_replay)
         self.btn_export_map.clicked.connect(self.open_map)
 
     # --- LOGIQUE MÉTIER ---
@@ -231,8 +448,12 @@ class MainWindow(QMainWindow):
         try:
             p, _ = QFileDialog.getOpenFileName(self, 'Adresses', '', 'CSV (*.csv)')
             if p: 
-                self.addrs = read_coords_csv(p)
+                self.addrs = read_coords_csv(p); self.addrs_path = p
+                self.addr_weights = read_address_weights(p)
                 self.log.append(f'📍 Adresses chargées: {len(self.addrs)}')
+                if self.addr_weights is not None:
+                    kind = 'horaires' if self.addr_weights.ndim == 2 else 'fixes'
+                    self.log.append(f'⚖ Poids de demande {kind} lus (appels tirés selon ces poids)')
                 self.plot_static_map()
         except ImportError: QMessageBox.critical(self, "Erreur", f"Module manquant: {ERROR_MSG}")
         except Exception as e: QMessageBox.critical(self, "Erreur", str(e))
@@ -241,12 +462,28 @@ class MainWindow(QMainWindow):
         try:
             p, _ = QFileDialog.getOpenFileName(self, 'Hôpitaux', '', 'CSV (*.csv)')
             if p: 
-                self.hops = read_coords_csv(p)
+                self.hops = read_coords_csv(p); self.hops_path = p
                 self.log.append(f'🏥 Hôpitaux chargés: {len(self.hops)}')
                 self.plot_static_map()
         except ImportError: QMessageBox.critical(self, "Erreur", f"Module manquant: {ERROR_MSG}")
         except Exception as e: QMessageBox.critical(self, "Erreur", str(e))
 
+    def load_road(self):
+        """Graphe routier : .npz compact, ou liste d'arcs CSV suivie du fichier des nœuds"""
+        try:
+            p, _ = QFileDialog.getOpenFileName(self, 'Réseau routier', '', 'Graphe (*.npz *.csv)')
+            if not p: return
+            nodes = None
+            if p.endswith('.csv'):
+                nodes, _ = QFileDialog.getOpenFileName(self, 'Nœuds du réseau (id, lat, lon)', '', 'CSV (*.csv)')
+                if not nodes: return
+            self.road_graph = load_road_graph(p, nodes)
+            self.road_path = p
+            n_edges = len(self.road_graph.indices)
+            self.log.append(f"🛣 Réseau routier : {self.road_graph.n_nodes} nœuds, {n_edges} arcs "
+                            f"(la matrice A utilisera les temps de parcours routiers)")
+        except Exception as e: QMessageBox.critical(self, "Erreur", str(e))
+
     def plot_static_map(self):
         self.canvas.ax.clear()
         self.canvas.ax.set_title("Carte Géographique")
@@ -271,50 +508,129 @@ class MainWindow(QMainWindow):
             # --- MODIFICATION : Tmax fixé à 10 min ---
             current_tmax = 10 
             
-            self.A, self.dist, self.times = build_matrices(self.addrs, self.hops, current_vmax, current_tmax)
-            self.log.append(f"✅ Matrice A construite (Tmax={current_tmax}min) : {self.A.shape}")
-
-            rows, cols = self.A.shape
-            self.table_matrix.setRowCount(rows); self.table_matrix.setColumnCount(cols)
-            self.table_matrix.setHorizontalHeaderLabels([f"H{j}" for j in range(cols)])
-            self.table_matrix.setVerticalHeaderLabels([f"A{i}" for i in range(rows)])
-
-            for i in range(rows):
-                for j in range(cols):
-                    val = self.A[i, j]
-                    item = QTableWidgetItem(str(val))
-                    item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                    if val == 1: item.setBackground(QColor("#2ecc71")); item.setForeground(QColor("white"))
-                    else: item.setBackground(QColor("#ecf0f1")); item.setForeground(QColor("#95a5a6"))
-                    self.table_matrix.setItem(i, j, item)
+            # cache disque adressé par contenu : même scénario + même vitesse => aucun recalcul
+            if self.cache is None: self.cache = MatrixCache()
+            sources = {k: v for k, v in (('addresses', self.addrs_path), ('hospitals', self.hops_path),
+                                         ('road_graph', self.road_path)) if v}
+            cache, addrs, hops = self.cache, self.addrs, self.hops
+            # réseau routier chargé : temps de parcours par Dijkstra borné (l'empreinte du graphe entre dans la clé)
+            build, params = build_matrices, {}
+            if self.road_graph is not None:
+                build, params = self.road_graph.build_matrices, {'road_graph': self.road_graph.digest}
+            road = params.get('road_graph')
+
+            # construction par blocs dans un thread : avancement bloc par bloc, annulable
+            def task(report):
+                return cache.get_or_build(addrs, hops, current_vmax, current_tmax, build,
+                                          sources=sources, progress=report, **params)
+
+            self.log.append(f"⏳ Construction de la matrice A ({len(addrs)} x {len(hops)})...")
+            self.start_task(task, lambda res: self.on_matrix_built(res, current_vmax, current_tmax, road),
+                            self.on_build_progress)
+
+        except Exception as e: QMessageBox.critical(self, "Erreur", str(e))
+
+    def on_build_progress(self, args):
+        done, total = args
+        self.progress.setMaximum(total); self.progress.setValue(done)
+
+    def on_matrix_built(self, result, current_vmax, current_tmax, road=None):
+        self.A, self.dist, self.times, hit = result
+        self.matrix_params = (current_vmax, current_tmax)
+        self.matrix_road = road
+        self.p_sol = None
+        self.progress.setMaximum(1); self.progress.setValue(1)
+        self.log.append(f"{'♻ Cache' if hit else '🆕 Calcul'} ({self.cache.stats()})")
+        self.log.append(f"✅ Matrice A construite (Tmax={current_tmax}min) : {self.A.shape}")
+        self.show_matrix()
+        self.check_unreachable(current_tmax)
+
+    def show_matrix(self):
+        rows, cols = self.A.shape
+        self.table_matrix.setModel(CoverageTableModel(self.A, self.table_matrix))
+
+        # vue résumée : part des couples couverts par bloc (au plus 200 x 200 blocs)
+        dens = coverage_density(self.A)
+        ax = self.density_canvas.ax
+        ax.clear()
+        ax.imshow(dens, aspect='auto', cmap='Greens', vmin=0, vmax=1, interpolation='nearest',
+                  extent=(0, cols, rows, 0))
+        ax.set_title(f"Densité de couverture ({dens.shape[0]} x {dens.shape[1]} blocs, ≈ {100 * dens.mean():.1f} % de 1)")
+        ax.set_xlabel("Hôpitaux"); ax.set_ylabel("Adresses")
+        self.density_canvas.draw_idle()
+
+        self.tabs.setCurrentWidget(self.density_canvas if rows * cols > self.LARGE_MATRIX else self.table_matrix)
+
+    def check_unreachable(self, current_tmax):
+        # Analyse des adresses inatteignables avec 10 min
+        unreach = np.where(self.A.sum(axis=1) == 0)[0]
+        if len(unreach) > 0:
+            times_un = self.times[unreach]
+            min_t = np.min(times_un, axis=1)
             
-            self.table_matrix.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
-            self.tabs.setCurrentIndex(0)
-
-            # Analyse des adresses inatteignables avec 10 min
-            unreach = np.where(self.A.sum(axis=1) == 0)[0]
-            if len(unreach) > 0:
-                times_un = self.times[unreach]
-                min_t = np.min(times_un, axis=1)
+            dists_un = self.dist[unreach]
+            min_d = np.min(dists_un, axis=1)
+            
+            msg = f"⚠ <b>{len(unreach)} adresses inatteignables avec Tmax=10min.</b><br>"
+            # réseau routier : les Dijkstra s'arrêtent à Tmax, les couples non couverts valent inf
+            if np.all(np.isfinite(min_t)):
                 sugg_t = math.ceil(np.max(min_t))
-                
-                dists_un = self.dist[unreach]
-                min_d = np.min(dists_un, axis=1)
-                worst_d = np.max(min_d)
-                sugg_v = math.ceil(worst_d / (current_tmax/60.0))
-                
-                msg = (f"⚠ <b>{len(unreach)} adresses inatteignables avec Tmax=10min.</b><br>"
-                       f"👉 Tmax nécessaire: {sugg_t} min<br>👉 Ou Vitesse nécessaire: {sugg_v} km/h")
-                QMessageBox.warning(self, "Couverture Incomplète", msg)
-                self.log.append(f"⚠ {len(unreach)} adresses non couvertes dans les 10 min.")
-                
-                try:
-                    ux = [self.addrs[i][0] for i in unreach]
-                    uy = [self.addrs[i][1] for i in unreach]
-                    self.canvas.ax.scatter(ux, uy, c='black', marker='x', s=80, label='HORS DELAI', zorder=10)
-                    self.canvas.draw()
-                except: pass
+                sugg_v = math.ceil(np.max(min_d) / (current_tmax/60.0))
+                msg += f"👉 Tmax nécessaire: {sugg_t} min<br>👉 Ou Vitesse nécessaire: {sugg_v} km/h"
+            else:
+                msg += "👉 Aucun hôpital atteignable par la route dans ce délai (temps au-delà de Tmax non calculés)"
+            QMessageBox.warning(self, "Couverture Incomplète", msg)
+            self.log.append(f"⚠ {len(unreach)} adresses non couvertes dans les 10 min.")
+            
+            try:
+                ux = [self.addrs[i][0] for i in unreach]
+                uy = [self.addrs[i][1] for i in unreach]
+                self.canvas.ax.scatter(ux, uy, c='black', marker='x', s=80, label='HORS DELAI', zorder=10)
+                self.canvas.draw()
+            except: pass
 
+    def save_store(self):
+        """Sauvegarde binaire (.npy + en-tête JSON) de A, dist, times"""
+        if self.A is None:
+            QMessageBox.warning(self, "Erreur", "Veuillez construire la matrice."); return
+        try:
+            p = QFileDialog.getExistingDirectory(self, 'Dossier de sauvegarde')
+            if not p: return
+            p = os.path.join(p, 'matrix_store')
+            sources = {}
+            if self.addrs_path: sources['addresses'] = self.addrs_path
+            if self.hops_path: sources['hospitals'] = self.hops_path
+            if self.matrix_road and self.road_path: sources['road_graph'] = self.road_path
+            vmax, tmax = self.matrix_params
+            save_matrix_store(p, self.A, self.dist, self.times, vmax, tmax, sources=sources,
+                              extra={'road_graph': self.matrix_road} if self.matrix_road else None)
+            self.log.append(f"💾 Matrices sauvegardées : {p}")
+        except Exception as e: QMessageBox.critical(self, "Erreur", str(e))
+
+    def open_store(self):
+        """Ouverture instantanée (memmap) d'une matrice déjà construite"""
+        try:
+            p = QFileDialog.getExistingDirectory(self, 'Magasin de matrices')
+            if not p: return
+            self.A, self.dist, self.times, meta = load_matrix_store(p)
+            self.matrix_params = (meta['vmax_kmh'], meta['Tmax_min'])
+            self.matrix_road = meta.get('road_graph')
+            self.p_sol = None
+            self.addr_weights = None
+            self.log.append(f"📦 Matrice ouverte (vmax={meta['vmax_kmh']:g} km/h, Tmax={meta['Tmax_min']:g} min) : {self.A.shape}")
+            # on recharge les coordonnées si les fichiers sources sont toujours là
+            stale = stale_sources(meta)
+            if stale:
+                self.log.append(f"⚠ Sources modifiées ou absentes : {', '.join(stale)}")
+            else:
+                src = meta.get('sources', {})
+                if 'addresses' in src:
+                    self.addrs_path = src['addresses']['path']; self.addrs = read_coords_csv(self.addrs_path)
+                    self.addr_weights = read_address_weights(self.addrs_path)
+                if 'hospitals' in src:
+                    self.hops_path = src['hospitals']['path']; self.hops = read_coords_csv(self.hops_path)
+                self.plot_static_map()
+            self.show_matrix()
         except Exception as e: QMessageBox.critical(self, "Erreur", str(e))
 
     def solve(self):
@@ -323,84 +639,305 @@ class MainWindow(QMainWindow):
         budget = self.spin_budget.value()
         cost = self.spin_cost.value()
         self.log.append(f"⏳ Optimisation Stricte... Budget={budget:,.0f}, Coût/U={cost:,.0f}")
+        # p = 0.1 par défaut ; p estimés par le point fixe hypercube si l'option est cochée
+        rate = self.spin_rate_hc.value() / 60.0 if self.chk_hypercube.isChecked() else None
+        if rate is not None:
+            self.log.append(f"🔁 p estimés par l'hypercube à {self.spin_rate_hc.value()} appels/h")
+
+        A, times, weights = self.A, self.times, self.addr_weights
+        addrs, hops = self.addrs, self.hops
+        # zones couvertes dessinées comme des cercles (vol d'oiseau) : sans objet si A vient du réseau routier
+        coverage_km = coverage_radius_km(*self.matrix_params) if self.matrix_params and not self.matrix_road else None
+        if self.matrix_road:
+            self.log.append("ℹ Matrice A routière : la carte n'affiche pas de zones couvertes circulaires")
+
+        # point fixe, MIP et carte dans un thread : l'avancement du solveur (incumbent, gap) remonte
+        # par le callback, et la résolution en cours s'arrête sur demande
+        def task(report):
+            stats = {}
+            if rate is None:
+                p, history, status = [0.1] * A.shape[1], [], None
+                x_sol, _ = solve_dynamic_expected(A, p, budget=budget, cost_per_amb=cost, min_per_hop=1,
+                                                  stats=stats, callback=report)
+            else:
+                x_sol, p, history, status = fixed_point_allocation(
+                    A, times, rate, budget=budget, cost_per_amb=cost,
+                    min_per_hop=1, demand=weights, stats=stats, callback=report
+                )
+            # mode d'affichage choisi selon le nombre d'adresses, densité des appels et zones couvertes
+            mapfile = create_map(addrs, hops, x_sol, mapfile='res_optim.html', heatmap=True, weights=weights,
+                                 coverage_km=coverage_km) if x_sol else None
+            return x_sol, p, history, status, stats, mapfile
+
+        self.incumbent = None
+        self.progress.setRange(0, 0)   # durée inconnue : barre animée
+        self.start_task(task, lambda res: self.on_solved(res, budget, cost, rate), self.on_solve_progress)
+
+    def on_solve_progress(self, args):
+        info = args[0]
+        if info.get('incumbent') is None:
+            self.lbl_task.setText(f"⏱ {info['time']:.1f} s"); return
+        self.lbl_task.setText(f"⏱ {info['time']:.1f} s | objectif {info['incumbent']:g} | "
+                              f"borne {info['bound']:.1f} | gap {info['gap']:.1%} | {info['nodes']} nœuds")
+        if info['incumbent'] != self.incumbent:
+            self.incumbent = info['incumbent']
+            self.log.append(f"⭐ Nouvelle solution : objectif {self.incumbent:g} (gap {info['gap']:.1%})")
+
+    def on_solved(self, result, budget, cost, rate=None):
+        self.x_sol, p, history, status, stats, mapfile = result
+        self.p_sol = p if self.x_sol else None   # p pour lesquels x_sol respecte la couverture stricte
+        self.p_sol_rate = rate
+        self.progress.setRange(0, 1); self.progress.setValue(1)
+        total_ambs = sum(self.x_sol) if self.x_sol else None
+        if history:
+            self.log.append(f"🔁 Point fixe : {len(history)} résolution(s), p moyen = {np.mean(p):.3f}, "
+                            f"couverture attendue = {history[-1][2]:.1%}")
+        if status is not None:
+            if status['status'] == 'infeasible' and self.x_sol:
+                # repli : la solution précédente ne couvre pas strictement avec les p évalués par l'hypercube
+                msg = (f"⚠ <b>Point fixe interrompu</b> : la résolution n°{status['iteration']} avec les p estimés "
+                       f"(p moyen = {np.mean(status['p_eval']):.3f}) est infaisable.<br>"
+                       f"Solution de repli : résolution n°{status['iteration'] - 1} (p moyen = {np.mean(p):.3f}), "
+                       f"la couverture stricte n'est pas garantie à la charge simulée.")
+                QMessageBox.warning(self, "Point fixe", msg)
+                self.log.append(f"⚠ Point fixe infaisable à la résolution n°{status['iteration']} "
+                                f"(p moyen évalué = {np.mean(status['p_eval']):.3f}) : solution de repli avec p moyen = {np.mean(p):.3f}")
+            elif status['status'] == 'non_finite':
+                self.log.append(f"⚠ Évaluation hypercube non finie à la résolution n°{status['iteration']}"
+                                + (" : solution de repli conservée" if self.x_sol else ""))
+            elif status['status'] == 'max_iter':
+                self.log.append(f"⚠ Point fixe non stabilisé après {status['iteration']} résolution(s) : dernière solution conservée")
+            if history and not status['hypercube_converged']:
+                self.log.append("⚠ Évaluation hypercube non convergée : p approximatifs")
+        self.log.append(f"🧮 Présolve : {stats['n_rows']} → {stats['n_rows_kept']} contraintes de couverture")
+        self.log.append(f"⏱ Construction modèle : {stats['build_time']:.3f} s | Résolution : {stats['solve_time']:.3f} s")
         
-        try:
-            p = [0.1] * self.A.shape[1]
-            self.x_sol, total_ambs = solve_dynamic_expected(
-                self.A, p, budget=budget, cost_per_amb=cost, min_per_hop=1 
-            )
+        if self.x_sol:
+            cout_total = total_ambs * cost
+            self.log.append(f"✅ Solution trouvée : {total_ambs} ambulances.")
             
-            if self.x_sol:
-                cout_total = total_ambs * cost
-                self.log.append(f"✅ Solution trouvée : {total_ambs} ambulances.")
-                
-                hopitaux_vides = self.x_sol.count(0)
-                if hopitaux_vides > 0:
-                    self.log.append(f"⚠ Info : {hopitaux_vides} hôpital/aux vide(s).")
-                
-                self.log.append(f"💰 Coût total : {cout_total:,.0f} (Reste : {budget - cout_total:,.0f})")
-                
-                self.table_hops.setRowCount(len(self.hops))
-                for j, count in enumerate(self.x_sol):
-                    self.table_hops.setItem(j, 0, QTableWidgetItem(f"Hôpital {j}"))
-                    self.table_hops.setItem(j, 1, QTableWidgetItem(str(count)))
-                    self.table_hops.setItem(j, 2, QTableWidgetItem(str(count)))
-                
-                self.tabs.setCurrentIndex(1)
-                self.mapfile = create_map(self.addrs, self.hops, self.x_sol, mapfile='res_optim.html')
-            else:
-                msg = "❌ <b>Optimisation Impossible.</b><br>" \
-                      "Le budget est insuffisant pour la couverture stricte.<br>" 
-                QMessageBox.critical(self, "Echec Critique", msg)
-                self.log.append("❌ Echec : Pas de solution avec ce budget.")
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur Solveur", str(e))
+            hopitaux_vides = self.x_sol.count(0)
+            if hopitaux_vides > 0:
+                self.log.append(f"⚠ Info : {hopitaux_vides} hôpital/aux vide(s).")
+            
+            self.log.append(f"💰 Coût total : {cout_total:,.0f} (Reste : {budget - cout_total:,.0f})")
+            
+            self.table_hops.setRowCount(len(self.hops))
+            for j, count in enumerate(self.x_sol):
+                self.table_hops.setItem(j, 0, QTableWidgetItem(f"Hôpital {j}"))
+                self.table_hops.setItem(j, 1, QTableWidgetItem(str(count)))
+                self.table_hops.setItem(j, 2, QTableWidgetItem(str(count)))
+            
+            self.tabs.setCurrentWidget(self.table_hops)
+            self.mapfile = mapfile
+        elif status is not None and status['status'] == 'non_finite':
+            QMessageBox.critical(self, "Echec Critique", "❌ <b>Évaluation hypercube impossible</b> (p non finis).")
+        else:
+            msg = "❌ <b>Optimisation Impossible.</b><br>" \
+                  "Le budget est insuffisant pour la couverture stricte.<br>" 
+            QMessageBox.critical(self, "Echec Critique", msg)
+            self.log.append("❌ Echec : Pas de solution avec ce budget.")
+
+    # --- CALCULS EN ARRIÈRE-PLAN ---
+    # un seul calcul à la fois : les actions qui modifient A ou la solution sont désactivées pendant ce temps
+    def start_task(self, task, on_result, on_progress):
+        if self.task is not None and self.task.isRunning(): return
+        self.task = TaskThread(task)
+        self.task.result_signal.connect(on_result)
+        self.task.progress_signal.connect(on_progress)
+        self.task.error_signal.connect(lambda msg: QMessageBox.critical(self, "Erreur", msg))
+        self.task.cancelled_signal.connect(lambda: self.log.append("⏹ Calcul annulé."))
+        self.task.finished.connect(self.on_task_finished)
+        self.set_task_running(True)
+        self.task.start()
+
+    def set_task_running(self, running):
+        for btn in (self.btn_build, self.btn_solve, self.btn_sweep, self.btn_open_store, self.btn_load_addrs,
+                    self.btn_load_hops, self.btn_load_road):
+            btn.setEnabled(not running)
+        self.btn_cancel.setEnabled(running)
+
+    def cancel_task(self):
+        if self.task is None or not self.task.isRunning(): return
+        self.task.cancel()
+        self.btn_cancel.setEnabled(False)
+        self.log.append("⏳ Annulation demandée...")
+
+    def on_task_finished(self):
+        self.set_task_running(False)
+        self.lbl_task.setText("")
+        if self.progress.maximum() == 0: self.progress.setRange(0, 1)
+
+    def sweep(self):
+        """Frontière ambulances/budget : un budget par multiple du coût unitaire, jusqu'au budget saisi"""
+        if self.A is None: return
+        budget = self.spin_budget.value()
+        cost = self.spin_cost.value()
+        if cost <= 0 or budget < cost:
+            QMessageBox.warning(self, "Erreur", "Le budget doit couvrir au moins une ambulance."); return
+        n_steps = int(budget // cost)
+        budgets = cost * np.arange(1, n_steps + 1) if n_steps <= 50 else np.linspace(cost, budget, 50)
+        A, times, weights = self.A, self.times, self.addr_weights
+        # mêmes p que "Optimiser" : p = 0.1, ou avec l'option hypercube ceux de la dernière solution du point fixe
+        # au même taux d'appels, sinon point fixe calculé ici au budget saisi ; balayage dans un thread, annulable
+        rate = self.spin_rate_hc.value() / 60.0 if self.chk_hypercube.isChecked() else None
+        if rate is None:
+            p_sol = [0.1] * A.shape[1]
+        else:
+            p_sol = self.p_sol if self.p_sol_rate == rate else None
+
+        def task(report):
+            p = p_sol
+            if p is None:
+                _, p, _, _ = fixed_point_allocation(A, times, rate, budget=budget, cost_per_amb=cost,
+                                                    min_per_hop=1, demand=weights, callback=report)
+            stats = {}
+            result = sweep_budget(A, list(p), budgets, cost, min_per_hop=1, stats=stats, callback=report)
+            return result, p, stats
+
+        self.progress.setRange(0, len(budgets)); self.progress.setValue(0)
+        self.start_task(task, self.on_swept, self.on_sweep_progress)
+
+    def on_sweep_progress(self, args):
+        info = args[0]
+        if 'step' in info: self.progress.setValue(info['step'])
+        self.lbl_task.setText(f"⏱ {info['time']:.1f} s")
+
+    def on_swept(self, result):
+        (budgets, totals, _), p, stats = result
+        self.progress.setValue(self.progress.maximum())
+        self.log.append(f"📈 Frontière : {len(budgets)} budgets en {stats['build_time'] + stats['solve_time']:.2f} s "
+                        f"(p moyen = {np.mean(p):.3f})")
+
+        ax = self.frontier_canvas.ax
+        ax.clear()
+        ax.set_title("Frontière Ambulances / Budget")
+        ax.grid(True, linestyle=':', alpha=0.6)
+        ok = ~np.isnan(totals)
+        ax.step(budgets[ok], totals[ok], where='post', c='#2c3e50', marker='o')
+        if (~ok).any():
+            ax.scatter(budgets[~ok], np.zeros((~ok).sum()), c='#e74c3c', marker='x', label='Infaisable')
+            ax.legend()
+        ax.set_xlabel("Budget"); ax.set_ylabel("Ambulances")
+        self.frontier_canvas.draw()
+        self.tabs.setCurrentWidget(self.frontier_canvas)
 
     def start_sim(self):
         if not self.x_sol: return
+        self.sim = Simulator(self.A, self.dist, self.times, self.x_sol, demand=self.addr_weights)
+        self.launch_sim(24*60)
+
+    def launch_sim(self, horizon):
         self.active_lines = {}
         self.plot_static_map() 
-        self.sim = Simulator(self.A, self.dist, self.times, self.x_sol)
-        self.sim_thread = SimThread(self.sim, self.spin_lambda.value()/60.0, 24*60)
+        if self.replay: self.replay.pause(); self.replay.deleteLater()
+        self.sim_thread = SimThread(self.sim, self.spin_lambda.value()/60.0, horizon)
+        self.replay = ReplayController(self.sim, horizon, speed=self.spin_speed.value(), parent=self)
         
         self.sim_thread.mission_signal.connect(self.on_sim_event)
-        self.sim_thread.progress_signal.connect(lambda c,t: self.progress.setValue(int(c/t*100)))
-        self.sim_thread.finished_signal.connect(lambda: [self.log.append("Fin Simu"), self.btn_start.setEnabled(True)])
+        self.sim_thread.finished_signal.connect(self.replay.on_sim_finished)
+        self.sim_thread.finished_signal.connect(
+            lambda log: self.log.append(f"Fin Simu ({len(log)} événements, t={self.sim.clock:.0f} min) : relecture en cours"))
+        self.replay.frame_signal.connect(self.on_replay_frame)
+        self.replay.finished_signal.connect(lambda: [self.log.append("Fin Relecture"), self.btn_start.setEnabled(True),
+                                                     self.btn_pause.setEnabled(False)])
         
         self.sim_thread.start()
+        self.replay.start()
         self.btn_start.setEnabled(False); self.btn_pause.setEnabled(True); self.btn_stop.setEnabled(True)
+        self.btn_pause.setText("⏸ Pause")
+        self.btn_save_state.setEnabled(True); self.slider_seek.setEnabled(True)
+
+    def save_state(self):
+        """Instantané de la simulation (en pause ou terminée), reprise possible après fermeture"""
+        if self.sim is None: return
+        if self.sim_thread and self.sim_thread.isRunning() and not self.sim_thread._pause:
+            QMessageBox.warning(self, "Erreur", "Mettre la simulation en pause avant de sauver son état."); return
+        try:
+            p, _ = QFileDialog.getSaveFileName(self, 'État de simulation', 'simulation.simstate', 'État (*.simstate)')
+            if not p: return
+            data = self.sim.snapshot(p)
+            self.log.append(f"💾 État sauvé à t={self.sim.clock:.1f} min ({len(data) / 1e6:.1f} Mo, {len(self.sim.event_q)} événements)")
+        except Exception as e: QMessageBox.critical(self, "Erreur", str(e))
+
+    def load_state(self):
+        """Reprise d'une simulation sauvée, avec la matrice courante (mêmes adresses et hôpitaux)"""
+        if self.A is None:
+            QMessageBox.warning(self, "Erreur", "Construire ou ouvrir la matrice de la simulation d'abord."); return
+        if self.sim_thread and self.sim_thread.isRunning(): return
+        try:
+            p, _ = QFileDialog.getOpenFileName(self, 'État de simulation', '', 'État (*.simstate)')
+            if not p: return
+            self.sim = Simulator.restore(p, self.A, self.dist, self.times)
+            self.x_sol = list(self.sim.x)
+            self.table_hops.setRowCount(len(self.x_sol))
+            horizon = self.sim._arrivals[1] if self.sim._arrivals else 24*60
+            self.log.append(f"⏯ Reprise à t={self.sim.clock:.1f} / {horizon:g} min")
+            self.launch_sim(horizon)
+        except Exception as e: QMessageBox.critical(self, "Erreur", str(e))
 
     def pause_sim(self):
-        if self.sim_thread:
-            if self.sim_thread._pause: 
-                self.sim_thread.resume()
+        if self.replay:
+            if not self.replay.is_playing(): 
+                self.sim_thread.resume(); self.replay.resume()
                 self.btn_pause.setText("⏸ Pause")
             else: 
-                self.sim_thread.pause()
+                self.sim_thread.pause(); self.replay.pause()
                 self.btn_pause.setText("▶ Reprendre")
 
     def stop_sim(self):
         if self.sim_thread: self.sim_thread.stop()
+        if self.replay:
+            self.replay.pause()
+            self.btn_start.setEnabled(True); self.btn_pause.setEnabled(False)
+
+    def seek_replay(self, value):
+        if self.replay:
+            self.replay.seek(self.replay.horizon * value / 1000)
 
     def on_sim_event(self, entry):
-        if not isinstance(entry, dict): return
-        
-        if entry.get('served') and 'hop' in entry:
-            try:
-                h, a = self.hops[entry['hop']], self.addrs[entry['addr']]
+        if isinstance(entry, dict) and entry.get('type') == 'error':
+            self.log.append(f"⚠ Simulation : {entry['msg']}")
+
+    # une image de la relecture : un lot d'entrées du journal, un seul rafraîchissement de la carte
+    # reset : l'état est recalculé depuis le début du journal (saut dans le temps)
+    def on_replay_frame(self, batch, t, reset):
+        m = len(self.x_sol)
+        if reset:
+            for line in self.active_lines.values():
+                line.remove()
+            self.active_lines = {}
+            self.busy_live, started = fleet_state(batch, m)
+            ended = ()
+        else:
+            started = batch[(batch['kind'] == ARRIVAL) & batch['served']]
+            completed = batch[batch['kind'] == COMPLETION]
+            self.busy_live += np.bincount(started['hop'], minlength=m) - np.bincount(completed['hop'], minlength=m)
+            ended = set(completed['mission_id'].tolist())
+            for mid in ended:
+                line = self.active_lines.pop(mid, None)
+                if line is not None: line.remove()
+
+        if self.hops and self.addrs:
+            for mid, hop, addr in zip(started['mission_id'].tolist(), started['hop'].tolist(), started['addr'].tolist()):
+                if mid in ended or len(self.active_lines) >= self.MAX_LINES: continue
+                h, a = self.hops[hop], self.addrs[addr]
                 l, = self.canvas.ax.plot([h[0], a[0]], [h[1], a[1]], c='#2ecc71', lw=2, alpha=0.8)
-                self.active_lines[entry.get('mission_id')] = l
-                self.canvas.draw()
-            except: pass
-            
-        elif entry.get('completed'):
-            mid = entry.get('mission_id')
-            if mid in self.active_lines:
-                try: self.active_lines[mid].remove(); del self.active_lines[mid]; self.canvas.draw()
-                except: pass
-        
-        for j in range(len(self.hops)):
-            avail = len(self.sim.available[j]); cap = self.x_sol[j]
+                self.active_lines[mid] = l
+        if reset or len(batch):
+            self.canvas.draw_idle()
+
+        horizon = self.replay.horizon
+        # la barre sert aussi aux calculs longs (plage 0..1 ou nombre d'adresses) : plage en % remise ici
+        if self.progress.maximum() != 100: self.progress.setRange(0, 100)
+        self.progress.setValue(int(min(t, horizon) / horizon * 100))
+        self.lbl_replay.setText(f"t = {t:.0f} min")
+        self.slider_seek.blockSignals(True)
+        self.slider_seek.setValue(int(min(t, horizon) / horizon * 1000))
+        self.slider_seek.blockSignals(False)
+
+        for j in range(m):
+            cap = self.x_sol[j]; avail = cap - int(self.busy_live[j])
             item = QTableWidgetItem(f"{avail} / {cap}")
             if avail == 0: item.setBackground(QColor("#e74c3c"))
             elif avail < cap: item.setBackground(QColor("#f1c40f"))
@@ -0,0 +1,203 @@
+# hypercube.py
+
+#Rôle global :
+# évaluation analytique approchée d'un déploiement d'ambulances (modèle "hypercube" de Larson),
+# alternative rapide à la simulation : probabilités d'occupation par hôpital et couverture attendue
+#
+# Hypothèses (les mêmes que simulator.py) :
+# - appels poissoniens de taux rate (par minute), adresse tirée selon demand (uniforme par défaut)
+# - l'appel est confié à l'hôpital couvrant le plus proche ayant une ambulance libre, sinon il est perdu
+# - durée d'une mission depuis l'hôpital j : aller t_ij + soins (moyenne mean_service) + retour t_ij
+#
+# Approximation : chaque ambulance k est occupée avec une probabilité rho_k, indépendamment des autres,
+# corrigée par le facteur Q de Larson calculé sur le système à pertes M/G/N/N équivalent (loi d'Erlang).
+
+from math import exp, log
+import numpy as np
+from scipy.special import gammaln, logsumexp
+
+from simulator import build_dispatch_index
+
+
+#facteurs de correction Q[k], k = 0..N, pour un système à pertes à N serveurs de charge offerte a (Erlangs)
+#Q[k] = P(k serveurs pris au hasard tous occupés) / rho^k, avec rho le taux d'occupation moyen
+#Q[k] croît comme rho^-k : à faible charge il déborde dès quelques centaines d'ambulances,
+#le calcul est donc mené en logarithmes (P et F) et c'est log Q qui est renvoyé
+#renvoie (log Q, rho, probabilité de blocage d'Erlang B)
+def loss_correction(N, a):
+    if N == 0:
+        return np.zeros(1), 0.0, 1.0
+    j = np.arange(N + 1)
+    lfact = gammaln(j + 1)   # log j!
+    logp = j * log(max(a, 1e-300)) - lfact
+    logp -= logsumexp(logp)
+    blocking = exp(logp[N])
+    rho = a * (1 - blocking) / N
+    logQ = np.zeros(N + 1)
+    if rho <= 0:
+        return logQ, 0.0, blocking
+    # log F_k(j) = log(j! / (j-k)!) - log(N! / (N-k)!) - k log rho, F_k(j) = 0 pour j < k
+    # (par blocs de valeurs de k, pour borner la mémoire à ~1e6 termes)
+    block = max(1, 1_000_000 // (N + 1))
+    for k0 in range(1, N + 1, block):
+        k = np.arange(k0, min(k0 + block, N + 1))[:, None]
+        logF = lfact[j] - lfact[np.maximum(j - k, 0)] - (lfact[N] - lfact[N - k]) - k * log(rho)
+        logQ[k0:k0 + len(k)] = logsumexp(np.where(j >= k, logp + logF, -np.inf), axis=1)
+    return logQ, float(rho), blocking
+
+
+#regroupe les adresses qui ont la même liste de dispatch (hôpitaux couvrants, dans le même ordre)
+#renvoie des tableaux complétés par -1 sur R = longueur maximale des listes :
+# H (G x R) hôpitaux par position, W (G) demande totale du groupe,
+# T (G x R) somme des demandes x temps de trajet par position, gid (n) groupe de chaque adresse
+def dispatch_groups(A, times, demand):
+    indptr, hops, reach = build_dispatch_index(A, times)
+    n = A.shape[0]
+    lengths = np.diff(indptr)
+    first = {}
+    gid = np.empty(n, dtype=np.int64)
+    for i in range(n):
+        gid[i] = first.setdefault(hops[indptr[i]:indptr[i+1]].tobytes(), len(first))
+    G, R = len(first), int(lengths.max()) if n else 0
+    pos = np.arange(len(hops)) - np.repeat(indptr[:-1], lengths)   # position dans la liste
+    row = np.repeat(gid, lengths)
+    H = np.full((G, R), -1, dtype=np.int64)
+    H[row, pos] = hops
+    T = np.zeros((G, R))
+    np.add.at(T, (row, pos), np.repeat(demand, lengths) * reach)
+    W = np.bincount(gid, weights=demand, minlength=G)
+    return H, W, T, gid
+
+
+#une passe du modèle : parcourt les listes de dispatch ambulance par ambulance (vectorisé sur les groupes)
+#renvoie (charge par hôpital en Erlangs, appels servis/min par hôpital, probabilité de perte par groupe,
+#         charge qu'auraient apportée les appels perdus)
+#les produits Q[k] x prod(rho) sont formés en logarithmes (cf. loss_correction) et bornés à 1
+def _hypercube_pass(H, W, T, x, rho, logQ, N, rate, mean_service):
+    G, R = H.shape
+    m = len(x)
+    load = np.zeros(m)
+    dispatch = np.zeros(m)
+    log_reach = np.zeros(G)      # log de la probabilité que toutes les ambulances déjà examinées soient occupées
+    k = np.zeros(G, dtype=np.int64)
+    for r in range(R):
+        valid = H[:, r] >= 0
+        j = np.where(valid, H[:, r], 0)
+        xr = np.where(valid, x[j], 0)
+        rr = rho[j]
+        with np.errstate(divide='ignore'):
+            log_rr = np.log(rr)
+        for s in range(int(xr.max()) if G else 0):
+            act = s < xr
+            all_busy = np.exp(np.minimum(logQ[np.minimum(k, N)] + log_reach, 0.0))
+            p_serve = np.where(act, all_busy * (1 - rr), 0.0)
+            dispatch += np.bincount(j, weights=rate * W * p_serve, minlength=m)
+            load += np.bincount(j, weights=rate * p_serve * (W * mean_service + 2 * T[:, r]), minlength=m)
+            log_reach = np.where(act, log_reach + log_rr, log_reach)
+            k += act
+    p_lost = np.where(k > 0, np.exp(np.minimum(logQ[np.minimum(k, N)] + log_reach, 0.0)), 1.0)
+    # appels perdus : charge évaluée vers le premier hôpital de la liste
+    with np.errstate(invalid='ignore', divide='ignore'):
+        first_travel = np.where(W > 0, T[:, 0] / W, 0.0) if R else np.zeros(G)
+    lost_load = float(np.sum(rate * W * p_lost * (mean_service + 2 * first_travel)))
+    return load, dispatch, p_lost, lost_load
+
+
+#évalue l'allocation x par itération de point fixe sur les rho_j (occupation d'une ambulance de l'hôpital j)
+# rate : appels par minute, mean_service : durée moyenne des soins (minutes)
+# demand : poids optionnels des adresses (vecteur, profil horaire (H, n) moyenné, ou AliasTable)
+# pas de mise à jour adaptatif : divisé par 2 dès que l'écart au point fixe (norme 2) augmente, multiplié par 1.2
+# (jusqu'à 0.5) tant qu'il diminue ; en forte charge le point fixe est raide et demande des pas plus petits.
+# Près de la saturation (rho proche de 1 partout), la boucle peut atteindre max_iter : converged vaut alors False
+#renvoie un dict :
+# p        : probabilité qu'une ambulance de l'hôpital j soit occupée (à passer à solve_dynamic_expected)
+# station_busy : probabilité que toutes les ambulances de l'hôpital j soient occupées
+# coverage : probabilité qu'un appel soit servi (couverture attendue), coverage_by_addr par adresse
+# dispatch_rate : appels servis par minute, par hôpital ; iterations, converged
+def hypercube_evaluate(A, times, x, rate, mean_service=20.0, demand=None, tol=1e-6, max_iter=1000):
+    n, m = A.shape
+    x = np.asarray(x, dtype=np.int64)
+    demand = np.ones(n) if demand is None else np.asarray(getattr(demand, 'weights', demand), dtype=float)
+    if demand.ndim == 2:
+        # profil horaire (H, n) : demande moyenne sur la journée
+        demand = (demand / demand.sum(axis=1, keepdims=True)).mean(axis=0)
+    demand = demand / demand.sum()
+    H, W, T, gid = dispatch_groups(A, times, demand)
+    N = int(x.sum())
+
+    rho = np.full(m, 0.5)
+    a_total = rate * mean_service
+    step, prev_norm = 0.5, np.inf
+    for it in range(1, max_iter + 1):
+        logQ, _, _ = loss_correction(N, a_total)
+        load, dispatch, _, lost_load = _hypercube_pass(H, W, T, x, rho, logQ, N, rate, mean_service)
+        new_rho = np.where(x > 0, np.clip(load / np.maximum(x, 1), 0.0, 0.999), 0.0)
+        delta = float(np.max(np.abs(new_rho - rho))) if m else 0.0
+        if delta < tol:
+            break
+        norm = float(np.linalg.norm(new_rho - rho))
+        step = max(step / 2, 1e-3) if norm >= prev_norm else min(step * 1.2, 0.5)
+        prev_norm = norm
+        rho = rho + step * (new_rho - rho)
+        a_total = a_total + step * (load.sum() + lost_load - a_total)
+
+    # probabilités finales avec les rho convergés
+    logQ, _, _ = loss_correction(N, a_total)
+    _, dispatch, p_lost, _ = _hypercube_pass(H, W, T, x, rho, logQ, N, rate, mean_service)
+    coverage_by_addr = 1 - p_lost[gid]
+    return {
+        'p': rho,
+        'station_busy': np.where(x > 0, rho ** x, 1.0),
+        'coverage': float(np.dot(demand, coverage_by_addr)),
+        'coverage_by_addr': coverage_by_addr,
+        'dispatch_rate': dispatch,
+        'iterations': it,
+        'converged': delta < tol,
+    }
+
+
+#boucle de point fixe optimisation <-> évaluation :
+#résout avec p, évalue la solution par l'hypercube, réinjecte les p calculés, jusqu'à stabilité de x et p
+#les hôpitaux sans ambulance gardent l'occupation moyenne des autres (valeur utilisée si le solveur y en place)
+#renvoie (x_sol, p, historique, état) :
+# x_sol : dernière solution trouvée, p : les p avec lesquels x_sol a été résolu (x_sol respecte la couverture
+#         stricte pour ces p, pas forcément pour les p évalués ensuite)
+# historique : [(x, p utilisés pour le résoudre, couverture attendue)]
+# état : dict avec status ('converged' ; 'infeasible' : la résolution n° iteration est infaisable, x_sol est
+#        celui de la résolution précédente, None si iteration vaut 1 ; 'non_finite' : l'évaluation de la résolution
+#        n° iteration donne des p non finis, jamais transmis au solveur, x_sol comme pour 'infeasible' ;
+#        'max_iter' : pas de stabilité),
+#        iteration, p_eval (p évalués par l'hypercube pour x_sol, None sans solution)
+#        et hypercube_converged (toutes les évaluations hypercube ont convergé)
+def fixed_point_allocation(A, times, rate, mean_service=20.0, budget=None, cost_per_amb=None, min_per_hop=1,
+                           p0=0.1, max_iter=20, tol=1e-3, demand=None, **solver_kwargs):
+    from solver_dynamic import solve_dynamic_expected
+    m = A.shape[1]
+    p = np.full(m, p0)
+    history = []
+    x_prev, p_prev, p_eval = None, p, None
+    status, hyper_ok, k = 'max_iter', True, 0
+    for k in range(1, max_iter + 1):
+        x_sol, _ = solve_dynamic_expected(A, list(p), budget=budget, cost_per_amb=cost_per_amb,
+                                          min_per_hop=min_per_hop, **solver_kwargs)
+        if x_sol is None:
+            status = 'infeasible'
+            break
+        res = hypercube_evaluate(A, times, x_sol, rate, mean_service, demand)
+        if not np.all(np.isfinite(res['p'])):
+            status = 'non_finite'
+            break
+        hyper_ok = hyper_ok and res['converged']
+        history.append((x_sol, p, res['coverage']))
+        x_arr = np.asarray(x_sol)
+        p_new = res['p'].copy()
+        if (x_arr > 0).any():
+            p_new[x_arr == 0] = p_new[x_arr > 0].mean()
+        done = x_prev is not None and x_prev == x_sol and np.max(np.abs(p_new - p)) < tol
+        x_prev, p_prev, p_eval = x_sol, p, p_new
+        p = p_new
+        if done:
+            status = 'converged'
+            break
+    return x_prev, p_prev, history, {'status': status, 'iteration': k, 'p_eval': p_eval,
+                                     'hypercube_converged': hyper_ok}
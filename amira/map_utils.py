@@ -1,18 +1,111 @@
 # map_utils.py
+import numpy as np
 import folium
-from folium.plugins import MarkerCluster
+from folium.plugins import MarkerCluster, FastMarkerCluster, HeatMap
 
+from build_A_dynamic import R
 
-def create_map(addrs, hospitals, x_sol, missions=None, mapfile='map.html'):
-    center = addrs[0] if addrs else (0,0)
+#modes d'affichage des adresses :
+# 'markers' : un folium.Marker par adresse dans un MarkerCluster (historique, lourd au-delà de quelques milliers)
+# 'fast'    : FastMarkerCluster, les marqueurs sont créés côté navigateur à partir d'un simple tableau de coordonnées
+# 'geojson' : une seule couche GeoJSON (MultiPoint), style appliqué côté navigateur
+# 'grid'    : adresses agrégées sur une grille de grid_km km (un cercle par case non vide, rayon selon l'effectif),
+#             la taille du fichier dépend de l'étendue couverte et non du nombre d'adresses
+# 'auto'    : 'markers' jusqu'à 1 000 adresses, 'fast' jusqu'à 20 000, 'grid' au-delà
+MAP_MODES = ('auto', 'markers', 'fast', 'geojson', 'grid')
+
+
+#agrège des points (lat, lon) sur une grille d'environ cell_km km de côté
+#renvoie (lat moyenne, lon moyenne, poids total) par case non vide
+def grid_aggregate(lat, lon, cell_km, weights=None):
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    weights = np.ones(len(lat)) if weights is None else np.asarray(weights, dtype=float)
+    dlat = np.degrees(cell_km / R)
+    dlon = dlat / max(np.cos(np.radians(np.mean(lat))), 1e-6) if len(lat) else dlat
+    # identifiant entier de case (ligne, colonne), un seul np.unique 1D
+    cells = np.floor(lat / dlat).astype(np.int64) * (1 << 32) + np.floor(lon / dlon).astype(np.int64)
+    _, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+    total = np.bincount(inverse, weights=weights)
+    return (np.bincount(inverse, weights=lat) / counts, np.bincount(inverse, weights=lon) / counts, total)
+
+
+#polygone (n_points sommets) des points situés à radius_km d'un centre (formule du point de destination),
+#au format GeoJSON : liste de [lon, lat], premier sommet répété à la fin
+def coverage_ring(lat, lon, radius_km, n_points=64):
+    phi1, lam1 = np.radians(lat), np.radians(lon)
+    delta = radius_km / R
+    theta = np.linspace(0, 2 * np.pi, n_points, endpoint=False)
+    phi2 = np.arcsin(np.sin(phi1) * np.cos(delta) + np.cos(phi1) * np.sin(delta) * np.cos(theta))
+    lam2 = lam1 + np.arctan2(np.sin(theta) * np.sin(delta) * np.cos(phi1), np.cos(delta) - np.sin(phi1) * np.sin(phi2))
+    ring = np.stack([np.degrees(lam2), np.degrees(phi2)], axis=1).round(6).tolist()
+    return ring + ring[:1]
+
+
+# addrs, hospitals : listes (ou tableaux) de (lat, lon) ; x_sol : ambulances par hôpital
+# mode : cf. MAP_MODES ; grid_km : taille des cases des modes 'grid' et de la carte de chaleur
+# heatmap : ajoute une carte de densité (calculée sur la grille, éventuellement pondérée par weights,
+#           poids des adresses ou profil horaire (H, n) moyenné sur la journée)
+# coverage_km : si fourni, ajoute la zone couverte par chaque hôpital (cercle de ce rayon, cf. coverage_radius_km)
+def create_map(addrs, hospitals, x_sol, missions=None, mapfile='map.html', mode='auto', grid_km=0.5,
+               heatmap=False, weights=None, coverage_km=None):
+    if mode not in MAP_MODES:
+        raise ValueError(f"Mode de carte inconnu: {mode} (choix: {', '.join(MAP_MODES)})")
+    pts = np.asarray(addrs, dtype=float).reshape(-1, 2)
+    n = len(pts)
+    if mode == 'auto':
+        mode = 'markers' if n <= 1000 else 'fast' if n <= 20000 else 'grid'
+
+    center = tuple(pts[0]) if n else (0,0)
     m = folium.Map(location=center, zoom_start=13)
-    mc = MarkerCluster().add_to(m)
-    for i,(la,lo) in enumerate(addrs):
-        folium.Marker((la,lo), popup=f'Adresse {i}', icon=folium.Icon(color='blue', icon='home')).add_to(mc)
+
+    if mode == 'markers':
+        mc = MarkerCluster().add_to(m)
+        for i,(la,lo) in enumerate(pts.tolist()):
+            folium.Marker((la,lo), popup=f'Adresse {i}', icon=folium.Icon(color='blue', icon='home')).add_to(mc)
+    elif mode == 'fast':
+        FastMarkerCluster(pts.round(6).tolist(), name='Adresses').add_to(m)
+    elif mode == 'geojson':
+        feature = {'type': 'Feature', 'properties': {},
+                   'geometry': {'type': 'MultiPoint', 'coordinates': pts[:, ::-1].round(6).tolist()}}
+        folium.GeoJson({'type': 'FeatureCollection', 'features': [feature]}, name='Adresses',
+                       marker=folium.CircleMarker(radius=3, weight=0, fill=True, fill_color='#2c7fb8', fill_opacity=0.7)
+                       ).add_to(m)
+    elif n:
+        # une seule couche GeoJSON : un point par case, rayon (en pixels) fixé côté navigateur selon l'effectif
+        la, lo, count = grid_aggregate(pts[:, 0], pts[:, 1], grid_km)
+        radius = 3 + 12 * np.sqrt(count / count.max())
+        features = [{'type': 'Feature', 'properties': {'adresses': c, 'r': r},
+                     'geometry': {'type': 'Point', 'coordinates': [b, a]}}
+                    for a, b, c, r in zip(la.round(6).tolist(), lo.round(6).tolist(),
+                                          count.astype(int).tolist(), radius.round(1).tolist())]
+        folium.GeoJson({'type': 'FeatureCollection', 'features': features}, name=f'Adresses (grille {grid_km:g} km)',
+                       marker=folium.CircleMarker(weight=0, fill=True, fill_color='#2c7fb8', fill_opacity=0.6),
+                       style_function=lambda f: {'radius': f['properties']['r']},
+                       tooltip=folium.GeoJsonTooltip(fields=['adresses'])).add_to(m)
+
+    if heatmap and n:
+        if weights is not None and np.ndim(weights) == 2:
+            weights = np.mean(weights, axis=0)
+        la, lo, w = grid_aggregate(pts[:, 0], pts[:, 1], grid_km, weights)
+        HeatMap(np.stack([la, lo, w / w.max()], axis=1).round(6).tolist(), name='Densité des appels',
+                radius=15).add_to(m)
+
+    if coverage_km is not None:
+        features = [{'type': 'Feature',
+                     'properties': {'name': f'Hôpital {j}', 'ambulances': int(x_sol[j]) if x_sol else 0},
+                     'geometry': {'type': 'Polygon', 'coordinates': [coverage_ring(hla, hlo, coverage_km)]}}
+                    for j, (hla, hlo) in enumerate(hospitals)]
+        folium.GeoJson({'type': 'FeatureCollection', 'features': features}, name='Zones couvertes',
+                       style_function=lambda f: {'color': '#c0392b' if f['properties']['ambulances'] else '#7f8c8d',
+                                                 'weight': 1, 'fillOpacity': 0.08},
+                       tooltip=folium.GeoJsonTooltip(fields=['name', 'ambulances'])).add_to(m)
+
     for j,(hla,hlo) in enumerate(hospitals):
         folium.Marker((hla,hlo), popup=f'Hôpital {j} ({x_sol[j]} ambulances)', icon=folium.Icon(color='red', icon='plus-sign')).add_to(m)
     if missions:
         for mission in missions:
             folium.PolyLine(mission['path']).add_to(m)
+    if heatmap or coverage_km is not None:
+        folium.LayerControl().add_to(m)
     m.save(mapfile)
-    return mapfile
\ No newline at end of file
+    return mapfile
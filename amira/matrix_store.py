@@ -0,0 +1,204 @@
+# matrix_store.py
+
+#Rôle global :
+# sauvegarde binaire des matrices A, dist, times (fichiers .npy) avec un petit en-tête JSON,
+# et rechargement par projection mémoire (memmap) : une matrice de 1 Go s'ouvre instantanément
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+from scipy.sparse import issparse, csr_matrix
+
+STORE_VERSION = 1
+META_FILE = 'meta.json'
+
+
+#empreinte SHA-256 d'un fichier (lecture par blocs de 1 Mo)
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+#sauvegarde les matrices dans le dossier path :
+# meta.json : vmax, Tmax, dimensions, types, fichiers sources et leurs empreintes
+# A.npy / dist.npy / times.npy (dense) ou indptr.npy / indices.npy / *_data.npy (CSR)
+#sources : dict optionnel {nom: chemin du fichier CSV} (ex. {'addresses': ..., 'hospitals': ...})
+#l'écriture se fait dans un dossier temporaire renommé à la fin (pas de magasin à moitié écrit)
+def save_matrix_store(path, A, dist, times, vmax_kmh, Tmax_min, sources=None, extra=None):
+    path = os.path.abspath(path)
+    tmp = path + '.tmp'
+    if os.path.exists(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+
+    sparse = issparse(A)
+    meta = {
+        'version': STORE_VERSION,
+        'vmax_kmh': float(vmax_kmh),
+        'Tmax_min': float(Tmax_min),
+        'shape': [int(A.shape[0]), int(A.shape[1])],
+        'sparse': sparse,
+        'sources': {},
+    }
+    for name, src in (sources or {}).items():
+        meta['sources'][name] = {'path': os.path.abspath(src), 'sha256': file_sha256(src)}
+    if extra:
+        meta.update(extra)
+
+    if sparse:
+        A = csr_matrix(A); dist = csr_matrix(dist); times = csr_matrix(times)
+        np.save(os.path.join(tmp, 'indptr.npy'), A.indptr)
+        np.save(os.path.join(tmp, 'indices.npy'), A.indices)
+        np.save(os.path.join(tmp, 'A_data.npy'), A.data.astype(np.int8))
+        np.save(os.path.join(tmp, 'dist_data.npy'), dist.data)
+        np.save(os.path.join(tmp, 'times_data.npy'), times.data)
+        meta['dtype'] = str(times.data.dtype)
+    else:
+        # A binaire : un octet par case suffit
+        np.save(os.path.join(tmp, 'A.npy'), np.asarray(A, dtype=np.int8))
+        np.save(os.path.join(tmp, 'dist.npy'), np.asarray(dist))
+        np.save(os.path.join(tmp, 'times.npy'), np.asarray(times))
+        meta['dtype'] = str(np.asarray(times).dtype)
+
+    with open(os.path.join(tmp, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp, path)
+    return path
+
+
+#lit uniquement l'en-tête JSON d'un magasin
+def read_store_meta(path):
+    with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+#recharge un magasin : renvoie A, dist, times, meta
+#mmap=True : les tableaux sont projetés en mémoire en lecture seule (aucune lecture complète du disque)
+def load_matrix_store(path, mmap=True):
+    meta = read_store_meta(path)
+    if meta.get('version') != STORE_VERSION:
+        raise ValueError(f"Version de magasin non supportée: {meta.get('version')}")
+    mode = 'r' if mmap else None
+    load = lambda name: np.load(os.path.join(path, name), mmap_mode=mode)
+    if meta['sparse']:
+        shape = tuple(meta['shape'])
+        indptr, indices = load('indptr.npy'), load('indices.npy')
+        A = csr_matrix((load('A_data.npy'), indices, indptr), shape=shape, copy=False)
+        dist = csr_matrix((load('dist_data.npy'), indices, indptr), shape=shape, copy=False)
+        times = csr_matrix((load('times_data.npy'), indices, indptr), shape=shape, copy=False)
+    else:
+        A, dist, times = load('A.npy'), load('dist.npy'), load('times.npy')
+    return A, dist, times, meta
+
+
+#vérifie que les fichiers sources enregistrés n'ont pas changé depuis la sauvegarde
+#renvoie la liste des noms de sources modifiées ou introuvables
+def stale_sources(meta):
+    stale = []
+    for name, info in meta.get('sources', {}).items():
+        if not os.path.exists(info['path']) or file_sha256(info['path']) != info['sha256']:
+            stale.append(name)
+    return stale
+
+
+#clé de contenu : SHA-256 des coordonnées (float64) et des paramètres de construction
+#deux scénarios identiques donnent la même clé, quel que soit le nom des fichiers
+def coverage_key(addrs, hospitals, vmax_kmh, Tmax_min, **params):
+    h = hashlib.sha256()
+    for coords in (addrs, hospitals):
+        arr = np.ascontiguousarray(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+        h.update(str(arr.shape).encode())
+        h.update(arr.tobytes())
+    h.update(json.dumps({'vmax_kmh': float(vmax_kmh), 'Tmax_min': float(Tmax_min), **params},
+                        sort_keys=True).encode())
+    return h.hexdigest()
+
+
+#taille totale (octets) d'un dossier
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+#cache disque des matrices, adressé par contenu (cf. coverage_key)
+#chaque entrée est un magasin matrix_store ; l'heure de modification de meta.json sert d'horodatage LRU
+#max_bytes : taille maximale du cache, les entrées les moins récemment utilisées sont supprimées au-delà
+class MatrixCache:
+    def __init__(self, root=None, max_bytes=2 * 1024**3):
+        if root is None:
+            root = os.path.join(os.path.expanduser('~'), '.cache', 'projetro_matrices')
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    #renvoie (A, dist, times, meta) ou None ; un succès rafraîchit l'horodatage LRU
+    def get(self, key):
+        entry = self._entry(key)
+        if not os.path.exists(os.path.join(entry, META_FILE)):
+            self.misses += 1
+            return None
+        try:
+            result = load_matrix_store(entry)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(os.path.join(entry, META_FILE))
+        self.hits += 1
+        return result
+
+    def put(self, key, A, dist, times, vmax_kmh, Tmax_min, sources=None):
+        entry = save_matrix_store(self._entry(key), A, dist, times, vmax_kmh, Tmax_min,
+                                  sources=sources, extra={'key': key})
+        self.evict(keep=key)
+        return entry
+
+    #renvoie (A, dist, times, hit) : lit le cache ou construit puis enregistre
+    def get_or_build(self, addrs, hospitals, vmax_kmh, Tmax_min, build, sources=None, progress=None, **params):
+        key = coverage_key(addrs, hospitals, vmax_kmh, Tmax_min, **params)
+        cached = self.get(key)
+        if cached is not None:
+            A, dist, times, _ = cached
+            return A, dist, times, True
+        # progress n'entre pas dans la clé : il est seulement transmis à build (cf. build_matrices)
+        extra = {} if progress is None else {'progress': progress}
+        A, dist, times = build(addrs, hospitals, vmax_kmh, Tmax_min, **params, **extra)
+        self.put(key, A, dist, times, vmax_kmh, Tmax_min, sources=sources)
+        return A, dist, times, False
+
+    #supprime les entrées les plus anciennes (LRU) jusqu'à repasser sous max_bytes
+    def evict(self, keep=None):
+        entries = []
+        for name in os.listdir(self.root):
+            meta = os.path.join(self.root, name, META_FILE)
+            if os.path.exists(meta):
+                entries.append((os.path.getmtime(meta), name, _dir_size(os.path.join(self.root, name))))
+        total = sum(size for _, _, size in entries)
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            total -= size
+
+    def stats(self):
+        return f"hits={self.hits}, misses={self.misses}"
@@ -0,0 +1,109 @@
+# mission_log.py
+
+#Rôle global :
+# journal des missions du simulateur sous forme de tableau structuré NumPy (une colonne par champ),
+# préalloué et agrandi par doublement, au lieu d'une liste de dictionnaires
+
+import os
+import numpy as np
+
+#type d'un événement du journal
+ARRIVAL = 0      #appel reçu (servi ou non)
+COMPLETION = 1   #fin de mission (ambulance libérée)
+
+LOG_DTYPE = np.dtype([
+    ('time', 'f8'),        #instant de l'événement (minutes)
+    ('kind', 'i1'),        #ARRIVAL ou COMPLETION
+    ('addr', 'i8'),        #adresse de l'appel
+    ('hop', 'i4'),         #hôpital affecté (-1 si appel non servi)
+    ('served', '?'),       #appel servi ?
+    ('start', 'f8'),       #début de mission (nan si non servi)
+    ('end', 'f8'),         #fin de mission prévue (nan si non servi)
+    ('mission_id', 'i8'),  #identifiant de mission (-1 si non servi)
+])
+
+
+class MissionLog:
+    #capacity : taille initiale du tampon (doublée à chaque dépassement)
+    #flush_path / flush_threshold : si fournis, le tampon est écrit (en binaire, à la suite) dans flush_path
+    #                               dès qu'il atteint flush_threshold entrées, puis vidé ; la mémoire reste bornée
+    def __init__(self, capacity=1024, flush_path=None, flush_threshold=None):
+        self._buf = np.empty(max(1, int(capacity)), dtype=LOG_DTYPE)
+        self._n = 0              #entrées en mémoire
+        self.n_flushed = 0       #entrées déjà écrites sur disque
+        self.flush_path = flush_path
+        self.flush_threshold = flush_threshold
+        if flush_path is not None and os.path.exists(flush_path):
+            os.remove(flush_path)
+
+    def append(self, time, kind, addr, hop=-1, served=False, start=np.nan, end=np.nan, mission_id=-1):
+        if self._n == len(self._buf):
+            grown = np.empty(2 * len(self._buf), dtype=LOG_DTYPE)
+            grown[:self._n] = self._buf[:self._n]
+            self._buf = grown
+        self._buf[self._n] = (time, kind, addr, hop, served, start, end, mission_id)
+        self._n += 1
+        if self.flush_threshold is not None and self._n >= self.flush_threshold:
+            self.flush()
+
+    #écrit les entrées en mémoire à la fin de flush_path et vide le tampon
+    def flush(self):
+        if self.flush_path is None or self._n == 0:
+            return
+        with open(self.flush_path, 'ab') as f:
+            f.write(self._buf[:self._n].tobytes())
+        self.n_flushed += self._n
+        self._n = 0
+
+    #vue sans copie sur les entrées encore en mémoire (tableau structuré : log.view()['time'], ...)
+    def view(self):
+        return self._buf[:self._n]
+
+    #nombre total d'entrées (mémoire + disque)
+    def __len__(self):
+        return self.n_flushed + self._n
+
+    def __bool__(self):
+        return len(self) > 0
+
+    #entrée k (parmi celles en mémoire) au format dictionnaire historique, pour l'interface
+    def __getitem__(self, k):
+        return entry_dict(self.view()[k])
+
+    def to_dicts(self):
+        return [entry_dict(row) for row in self.view()]
+
+    #sérialisation (pickle, cf. Simulator.snapshot) : seules les entrées utiles du tampon sont copiées
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_buf'] = self._buf[:max(self._n, 1)].copy()
+        return state
+
+
+#convertit une ligne du journal au format dictionnaire historique
+def entry_dict(row):
+    if row['kind'] == COMPLETION:
+        return {'time': float(row['time']), 'completed': True, 'mission_id': int(row['mission_id']),
+                'hop': int(row['hop']), 'addr': int(row['addr'])}
+    if not row['served']:
+        return {'time': float(row['time']), 'addr': int(row['addr']), 'served': False}
+    return {'time': float(row['time']), 'addr': int(row['addr']), 'served': True, 'hop': int(row['hop']),
+            'start': float(row['start']), 'expected_end': float(row['end']), 'mission_id': int(row['mission_id'])}
+
+
+#état de la flotte après un préfixe du journal (ex. entrées jusqu'à l'instant t d'une relecture)
+#renvoie (ambulances occupées par hôpital, missions en cours = lignes ARRIVAL servies sans fin de mission)
+def fleet_state(entries, m):
+    started = entries[(entries['kind'] == ARRIVAL) & entries['served']]
+    ended = entries['mission_id'][entries['kind'] == COMPLETION]
+    active = started[~np.isin(started['mission_id'], ended)]
+    return np.bincount(active['hop'], minlength=m), active
+
+
+#relit un journal écrit par flush (projection mémoire si mmap=True)
+def load_mission_log(path, mmap=True):
+    if mmap:
+        if os.path.getsize(path) == 0:
+            return np.empty(0, dtype=LOG_DTYPE)
+        return np.memmap(path, dtype=LOG_DTYPE, mode='r')
+    return np.fromfile(path, dtype=LOG_DTYPE)
@@ -0,0 +1,225 @@
+# road_network.py
+
+#Rôle global :
+# matrices A, dist, times calculées sur un réseau routier local au lieu de la distance à vol d'oiseau :
+# 1) adresses et hôpitaux rattachés au nœud du graphe le plus proche (KD-tree sur la sphère unité)
+# 2) un Dijkstra borné à Tmax par hôpital (scipy.sparse.csgraph), au lieu de n x m requêtes
+# 3) distance en km reconstituée le long de l'arbre des plus courts chemins (en temps)
+# les sorties ont le même format que build_matrices : le solveur et le simulateur sont inchangés
+
+import hashlib
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from build_A_dynamic import R, unit_xyz, read_coords_arrays, _report_block
+
+
+class RoadGraph:
+    #lat, lon : coordonnées des N nœuds
+    #indptr, indices : structure CSR des arcs orientés (arc u -> indices[k] pour k dans [indptr[u], indptr[u+1]))
+    #length_km : longueur de chaque arc ; speed_kmh : vitesse de chaque arc (NaN => vmax_kmh à la construction)
+    def __init__(self, lat, lon, indptr, indices, length_km, speed_kmh=None):
+        self.lat = np.ascontiguousarray(lat, dtype=np.float64)
+        self.lon = np.ascontiguousarray(lon, dtype=np.float64)
+        self.n_nodes = len(self.lat)
+        self.indptr = np.ascontiguousarray(indptr, dtype=np.int64)
+        self.indices = np.ascontiguousarray(indices, dtype=np.int64)
+        self.length_km = np.ascontiguousarray(length_km, dtype=np.float64)
+        n_edges = len(self.indices)
+        self.speed_kmh = (np.full(n_edges, np.nan) if speed_kmh is None
+                          else np.ascontiguousarray(speed_kmh, dtype=np.float64))
+        if len(self.lon) != self.n_nodes or len(self.indptr) != self.n_nodes + 1 or self.indptr[-1] != n_edges:
+            raise ValueError("Graphe routier : structure CSR incohérente avec le nombre de nœuds")
+        if len(self.length_km) != n_edges or len(self.speed_kmh) != n_edges:
+            raise ValueError("Graphe routier : une longueur et une vitesse attendues par arc")
+        if n_edges and (self.indices.min() < 0 or self.indices.max() >= self.n_nodes):
+            raise ValueError("Graphe routier : arc vers un nœud inexistant")
+        if np.any(~np.isfinite(self.length_km) | (self.length_km < 0)):
+            raise ValueError("Graphe routier : longueurs finies et positives attendues")
+        if np.any(self.speed_kmh <= 0):
+            raise ValueError("Graphe routier : vitesses strictement positives attendues")
+        self.tree = cKDTree(unit_xyz(np.column_stack((self.lat, self.lon)))) if self.n_nodes else None
+        # empreinte du contenu (clé du cache de matrices, cf. MatrixCache)
+        h = hashlib.sha256()
+        for arr in (self.lat, self.lon, self.indptr, self.indices, self.length_km, self.speed_kmh):
+            h.update(arr.tobytes())
+        self.digest = h.hexdigest()
+
+    #graphe à partir d'une liste d'arcs (u, v) (indices de nœuds) ; oneway[k] faux => arc ajouté dans les deux sens
+    @classmethod
+    def from_edges(cls, lat, lon, u, v, length_km, speed_kmh=None, oneway=None):
+        u, v = np.asarray(u, dtype=np.int64), np.asarray(v, dtype=np.int64)
+        length_km = np.asarray(length_km, dtype=np.float64)
+        speed_kmh = np.full(len(u), np.nan) if speed_kmh is None else np.asarray(speed_kmh, dtype=np.float64)
+        back = np.ones(len(u), dtype=bool) if oneway is None else ~np.asarray(oneway, dtype=bool)
+        u, v = np.concatenate([u, v[back]]), np.concatenate([v, u[back]])
+        length_km = np.concatenate([length_km, length_km[back]])
+        speed_kmh = np.concatenate([speed_kmh, speed_kmh[back]])
+        n = len(lat)
+        order = np.lexsort((v, u))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(u, minlength=n), out=indptr[1:])
+        return cls(lat, lon, indptr, v[order], length_km[order], speed_kmh[order])
+
+    #format compact sur disque : un .npz (lat, lon, indptr, indices, length_km, speed_kmh)
+    def save(self, path):
+        np.savez(path, lat=self.lat, lon=self.lon, indptr=self.indptr, indices=self.indices,
+                 length_km=self.length_km, speed_kmh=self.speed_kmh)
+        return path
+
+    #temps (minutes) et longueurs (km) des arcs sous forme de deux CSR N x N de même structure
+    #arcs parallèles : seul le plus rapide est gardé (csr_matrix additionnerait les doublons) ; boucles retirées
+    def edge_matrices(self, vmax_kmh):
+        rows = np.repeat(np.arange(self.n_nodes, dtype=np.int64), np.diff(self.indptr))
+        speed = np.where(np.isnan(self.speed_kmh), float(vmax_kmh), self.speed_kmh)
+        t = self.length_km / speed * 60.0
+        order = np.lexsort((t, self.indices, rows))
+        r, c, t, km = rows[order], self.indices[order], t[order], self.length_km[order]
+        first = np.ones(len(r), dtype=bool)
+        first[1:] = (r[1:] != r[:-1]) | (c[1:] != c[:-1])
+        keep = first & (r != c)
+        r, c, t, km = r[keep], c[keep], t[keep], km[keep]
+        indptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(r, minlength=self.n_nodes), out=indptr[1:])
+        # csgraph ignore les zéros stockés : un arc de durée nulle reçoit une durée infime
+        T = csr_matrix((np.maximum(t, 1e-9), c, indptr), shape=(self.n_nodes, self.n_nodes))
+        K = csr_matrix((km, c, indptr), shape=(self.n_nodes, self.n_nodes))
+        return T, K
+
+    #nœud le plus proche de chaque point (lat, lon) et distance (km, grand cercle) jusqu'à ce nœud
+    def snap(self, coords):
+        if self.tree is None:
+            raise ValueError("Graphe routier vide")
+        chord, node = self.tree.query(unit_xyz(coords))
+        return node.astype(np.int64), 2 * R * np.arcsin(np.minimum(chord / 2, 1.0))
+
+    #construction avec l'interface de build_matrices (cf. build_road_matrices), utilisable par MatrixCache :
+    # cache.get_or_build(addrs, hops, vmax, Tmax, graph.build_matrices, road_graph=graph.digest)
+    # road_graph : empreinte attendue du graphe (entre dans la clé du cache), vérifiée si elle est fournie
+    def build_matrices(self, addrs, hospitals, vmax_kmh=40, Tmax_min=10, road_graph=None, **kwargs):
+        if road_graph is not None and road_graph != self.digest:
+            raise ValueError("Graphe routier différent de celui de la clé de cache")
+        return build_road_matrices(addrs, hospitals, self, vmax_kmh, Tmax_min, **kwargs)
+
+
+#charge un graphe routier :
+# .npz : format compact écrit par RoadGraph.save
+# .csv : liste d'arcs sans en-tête (u, v, longueur_km[, vitesse_kmh[, sens_unique]]), u et v étant les
+#        identifiants des nœuds de nodes_path (même format que les adresses : id, lat, lon) ;
+#        vitesse vide => vmax_kmh, sens_unique absent ou 0 => arc dans les deux sens
+def load_road_graph(path, nodes_path=None):
+    if str(path).endswith('.npz'):
+        with np.load(path) as data:
+            return RoadGraph(data['lat'], data['lon'], data['indptr'], data['indices'], data['length_km'],
+                             data['speed_kmh'])
+    if nodes_path is None:
+        raise ValueError("Liste d'arcs : le fichier des nœuds (id, lat, lon) est requis")
+    ids, lat, lon = read_coords_arrays(nodes_path)
+    df = pd.read_csv(path, header=None, dtype={0: str, 1: str})
+    if df.shape[1] < 3:
+        raise ValueError(f"{path}: colonnes attendues : u, v, longueur_km[, vitesse_kmh[, sens_unique]]")
+    index = pd.Index(ids)
+    u = index.get_indexer(df.iloc[:, 0].str.strip())
+    v = index.get_indexer(df.iloc[:, 1].str.strip())
+    missing = np.flatnonzero((u < 0) | (v < 0))
+    if missing.size:
+        shown = ', '.join(str(k + 1) for k in missing[:10]) + (' ...' if len(missing) > 10 else '')
+        raise ValueError(f"{path}: {len(missing)} arc(s) vers un nœud inconnu (lignes {shown})")
+    cols = [pd.to_numeric(df.iloc[:, k], errors='coerce').to_numpy(dtype=np.float64) if k < df.shape[1] else None
+            for k in (2, 3, 4)]
+    oneway = None if cols[2] is None else np.nan_to_num(cols[2]) != 0
+    return RoadGraph.from_edges(lat, lon, u, v, cols[0], cols[1], oneway)
+
+
+#longueur (km) du chemin de chaque nœud depuis la source, le long de l'arbre des prédécesseurs P (b x N)
+#saut de pointeurs : après k passes, acc[v] couvre les 2^k derniers arcs du chemin de v
+def _path_lengths(P, K):
+    b, N = P.shape
+    keys = np.repeat(np.arange(N, dtype=np.int64), np.diff(K.indptr)) * N + K.indices   # triées (CSR)
+    acc = np.zeros((b, N))
+    r, v = np.nonzero(P >= 0)
+    u = P[r, v].astype(np.int64)
+    acc[r, v] = K.data[np.searchsorted(keys, u * N + v)]
+    ptr = np.where(P >= 0, P, -1).astype(np.int64)
+    while True:
+        r, v = np.nonzero(ptr >= 0)
+        if not len(r):
+            return acc
+        p = ptr[r, v]
+        acc[r, v] = acc[r, v] + acc[r, p]
+        ptr[r, v] = ptr[r, p]
+
+
+#construit A, dist, times sur le graphe routier graph (RoadGraph)
+# vmax_kmh : vitesse des arcs sans vitesse propre ; Tmax_min : seuil de couverture et borne des Dijkstra
+# snap_speed_kmh : vitesse du trajet à vol d'oiseau entre un point et son nœud (vmax_kmh par défaut)
+# max_snap_km : point plus loin que cela de tout nœud => hors réseau (jamais couvert)
+# block_size : hôpitaux traités par appel à dijkstra (par défaut : environ 4 millions de cases b x N)
+# sparse=False : A, dist, times denses, temps et distances infinis au-delà de Tmax (non explorés)
+# sparse=True  : CSR, seuls les couples atteignables en Tmax sont stockés (comme build_sparse_matrices)
+# progress : cf. build_matrices (avancement en hôpitaux traités)
+# times[i, j] = accès hôpital -> nœud + trajet routier (en temps minimal) + nœud -> adresse ; dist idem en km
+def build_road_matrices(addrs, hospitals, graph, vmax_kmh=40, Tmax_min=10, snap_speed_kmh=None, max_snap_km=None,
+                        block_size=None, dtype=float, sparse=False, progress=None):
+    addrs = np.asarray(addrs, dtype=float).reshape(-1, 2)
+    hospitals = np.asarray(hospitals, dtype=float).reshape(-1, 2)
+    n, m = len(addrs), len(hospitals)
+    snap_speed = float(vmax_kmh if snap_speed_kmh is None else snap_speed_kmh)
+    T, K = graph.edge_matrices(vmax_kmh)
+    a_node, a_km = graph.snap(addrs) if n else (np.zeros(0, dtype=np.int64), np.zeros(0))
+    h_node, h_km = graph.snap(hospitals) if m else (np.zeros(0, dtype=np.int64), np.zeros(0))
+    if max_snap_km is not None:
+        a_km = np.where(a_km <= max_snap_km, a_km, np.inf)
+        h_km = np.where(h_km <= max_snap_km, h_km, np.inf)
+    a_min = a_km / snap_speed * 60.0
+    h_min = h_km / snap_speed * 60.0
+
+    # un seul Dijkstra par nœud de départ, même si plusieurs hôpitaux y sont rattachés
+    sources, h_src = np.unique(h_node, return_inverse=True)
+    if block_size is None:
+        block_size = 4_000_000 // max(graph.n_nodes, 1)
+    block_size = max(1, int(block_size))
+
+    if sparse:
+        rows, cols, dists, tms = [], [], [], []
+    else:
+        dist = np.full((n, m), np.inf, dtype=dtype)
+        times = np.full((n, m), np.inf, dtype=dtype)
+    done = 0
+    for start in range(0, len(sources), block_size):
+        stop = min(start + block_size, len(sources))
+        D, P = dijkstra(T, directed=True, indices=sources[start:stop], limit=Tmax_min, return_predecessors=True)
+        L = _path_lengths(P, K)
+        hs = np.flatnonzero((h_src >= start) & (h_src < stop))
+        for j in hs:
+            s = h_src[j] - start
+            t = h_min[j] + D[s, a_node] + a_min
+            d = h_km[j] + L[s, a_node] + a_km
+            if sparse:
+                i = np.flatnonzero(t <= Tmax_min)
+                rows.append(i); cols.append(np.full(len(i), j, dtype=np.int64))
+                dists.append(d[i]); tms.append(t[i])
+            else:
+                times[:, j] = t
+                dist[:, j] = np.where(np.isfinite(t), d, np.inf)   # L vaut 0 hors de l'arbre
+        done += len(hs)
+        _report_block(progress, done, m)
+
+    if not sparse:
+        A = (times <= Tmax_min).astype(int)
+        return A, dist, times
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    d = np.concatenate(dists) if dists else np.zeros(0)
+    t = np.concatenate(tms) if tms else np.zeros(0)
+    order = np.lexsort((cols, rows))   # indices triés par ligne puis par colonne
+    rows, cols, d, t = rows[order], cols[order], d[order], t[order]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    A = csr_matrix((np.ones(len(cols), dtype=np.int8), cols, indptr), shape=(n, m))
+    dist = csr_matrix((d.astype(dtype), cols, indptr), shape=(n, m))
+    times = csr_matrix((t.astype(dtype), cols, indptr), shape=(n, m))
+    return A, dist, times
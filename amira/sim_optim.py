@@ -0,0 +1,160 @@
+# sim_optim.py
+
+#Rôle global :
+# optimisation par simulation de l'allocation des ambulances :
+# - nombres aléatoires communs : les flux d'appels (instants, adresses, durées de soins) de chaque réplication
+#   sont tirés une seule fois et rejoués à l'identique pour toutes les allocations candidates,
+#   les écarts observés entre candidats viennent donc des allocations et non du hasard
+# - sélection séquentielle (ranking & selection) : les candidats sont simulés par lots de réplications,
+#   ceux dont l'écart apparié avec le meilleur est significatif sont éliminés avant la fin
+# - recherche locale : on part de la solution du MIP (solve_dynamic_expected) et on déplace
+#   une ambulance d'un hôpital à un autre tant que cela améliore l'objectif
+
+import numpy as np
+from scipy.stats import t as student
+
+from simulator import Simulator, sample_calls, build_dispatch_index
+from sim_stats import SimStats
+from alias_table import AliasTable
+
+#sens de chaque objectif : +1 à maximiser, -1 à minimiser (clés de SimStats.summary)
+OBJECTIVES = {'service_rate': 1.0, 'mean_response': -1.0}
+
+
+#tire n_reps flux d'appels indépendants sur [0, horizon) (une graine fille par réplication)
+# demand : poids des adresses (vecteur, tableau horaire ou AliasTable), cf. Simulator
+#renvoie une liste de (instants, adresses, durées de soins), cf. sample_calls
+def common_streams(n_addr, rate, horizon, n_reps, seed=0, mean_service=20.0, rate_profile=None, demand=None):
+    if demand is not None and not isinstance(demand, AliasTable):
+        demand = AliasTable(demand)
+    children = np.random.SeedSequence(seed).spawn(n_reps)
+    return [sample_calls(np.random.default_rng(child), rate, 0.0, horizon, n_addr, mean_service, rate_profile, demand)
+            for child in children]
+
+
+_WORKER = {}
+
+
+#chaque processus reçoit une seule fois A, times et les flux d'appels communs,
+#et calcule une seule fois l'index de dispatch (identique pour toutes les allocations candidates)
+def _init_worker(A, times, streams, horizon, objective):
+    _WORKER.update(A=A, times=times, streams=streams, horizon=horizon, objective=objective,
+                   index=build_dispatch_index(A, times))
+
+
+#une réplication : l'allocation x rejoue le flux d'appels r ; renvoie l'objectif signé (plus grand = meilleur)
+def _evaluate(args):
+    x, r = args
+    A, times, horizon, objective = _WORKER['A'], _WORKER['times'], _WORKER['horizon'], _WORKER['objective']
+    stats = SimStats(len(x), (), horizon)
+    sim = Simulator(A, None, times, list(x), log=False, stats=stats, dispatch_index=_WORKER['index'])
+    sim.load_calls(*_WORKER['streams'][r])
+    sim.run(horizon)
+    value = stats.summary(x, horizon)[objective]
+    return -np.inf if np.isnan(value) else OBJECTIVES[objective] * value
+
+
+#sélection du meilleur candidat par élimination séquentielle
+# scores : dict {x: liste des objectifs signés par réplication}, complété par evaluate(liste de (x, r))
+# à chaque lot, le candidat i est éliminé si la borne basse de l'IC de l'écart apparié (meilleur - i)
+# dépasse delta (zone d'indifférence) ; les réplications déjà simulées sont réutilisées
+#renvoie (meilleur candidat, moyenne de son objectif signé, nombre de réplications utilisées)
+def select_best(candidates, scores, evaluate, n_reps, batch=5, confidence=0.95, delta=0.0):
+    survivors = list(dict.fromkeys(candidates))
+    r = 0
+    while r < n_reps:
+        r = min(r + batch, n_reps)
+        evaluate([(x, k) for x in survivors for k in range(len(scores.get(x, ())), r)])
+        S = np.array([scores[x][:r] for x in survivors])
+        best = int(np.argmax(S.mean(axis=1)))
+        if len(survivors) == 1 or r < 2:
+            continue
+        diff = S[best] - S   # écarts appariés : mêmes flux d'appels pour tous les candidats
+        with np.errstate(invalid='ignore'):
+            half = student.ppf(confidence, r - 1) * diff.std(axis=1, ddof=1) / np.sqrt(r)
+            keep = ~(diff.mean(axis=1) - half > delta)
+        keep[best] = True
+        survivors = [x for x, k in zip(survivors, keep) if k]
+        if len(survivors) == 1:
+            break
+    means = [np.mean(scores[x][:r]) for x in survivors]
+    best = int(np.argmax(means))
+    return survivors[best], float(means[best]), r
+
+
+#voisinage de x : une ambulance déplacée de l'hôpital j vers l'hôpital k
+#cover : si fourni (matrice C = A diag(1-p)), seuls les voisins qui respectent C @ x >= 1 sont gardés
+def neighbours(x, cover=None):
+    x = np.asarray(x, dtype=np.int64)
+    out = []
+    for j in np.flatnonzero(x > 0):
+        for k in range(len(x)):
+            if k == j:
+                continue
+            y = x.copy()
+            y[j] -= 1
+            y[k] += 1
+            if cover is not None and np.any(cover @ y < 1 - 1e-9):
+                continue
+            out.append(tuple(int(v) for v in y))
+    return out
+
+
+#recherche locale par simulation à partir de la solution du MIP (ou de x0)
+# rate : appels par minute, horizon : durée simulée par réplication (minutes)
+# p, budget, cost_per_amb, min_per_hop, solver_kwargs : passés à solve_dynamic_expected si x0 n'est pas fourni
+# keep_coverage : n'explorer que les allocations qui restent faisables pour la couverture stricte du MIP
+# n_reps, batch, confidence, delta : paramètres de la sélection séquentielle (cf. select_best)
+# objective : 'service_rate' (maximisé) ou 'mean_response' (minimisé) ; demand : poids des adresses (cf. Simulator)
+# stats : dict optionnel rempli avec iterations, n_simulations, history [(x, objectif moyen)]
+#renvoie (meilleure allocation (liste), objectif moyen) ; (None, None) si le MIP est infaisable
+def optimise_allocation(A, times, rate, horizon, x0=None, p=None, budget=None, cost_per_amb=None, min_per_hop=1,
+                        n_reps=20, batch=5, confidence=0.95, delta=0.0, max_iter=50, keep_coverage=True,
+                        objective='service_rate', mean_service=20.0, rate_profile=None, demand=None, seed=0,
+                        processes=None, stats=None, **solver_kwargs):
+    from concurrent.futures import ProcessPoolExecutor
+    from solver_dynamic import solve_dynamic_expected, coverage_coefficients
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Objectif inconnu: {objective} (choix: {', '.join(OBJECTIVES)})")
+    m = A.shape[1]
+    p = [0.1] * m if p is None else list(p)
+    if x0 is None:
+        x0, _ = solve_dynamic_expected(A, p, budget=budget, cost_per_amb=cost_per_amb,
+                                       min_per_hop=min_per_hop, **solver_kwargs)
+        if x0 is None:
+            return None, None
+    cover = coverage_coefficients(A, p) if keep_coverage else None
+
+    streams = common_streams(A.shape[0], rate, horizon, n_reps, seed, mean_service, rate_profile, demand)
+    scores = {}
+    history = []
+
+    pool = None
+    if processes != 1:
+        pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                   initargs=(A, times, streams, horizon, objective))
+    else:
+        _init_worker(A, times, streams, horizon, objective)
+
+    def evaluate(tasks):
+        values = pool.map(_evaluate, tasks, chunksize=max(1, len(tasks) // 64)) if pool else map(_evaluate, tasks)
+        for (x, _), v in zip(tasks, values):
+            scores.setdefault(x, []).append(v)
+
+    try:
+        current = tuple(int(v) for v in x0)
+        it = 0
+        for it in range(1, max_iter + 1):
+            best, value, _ = select_best([current] + neighbours(current, cover), scores, evaluate,
+                                         n_reps, batch, confidence, delta)
+            history.append((list(best), OBJECTIVES[objective] * value))
+            if best == current:
+                break
+            current = best
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if stats is not None:
+        stats.update(iterations=it, n_simulations=sum(len(v) for v in scores.values()), history=history)
+    return list(current), history[-1][1]
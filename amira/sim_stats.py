@@ -0,0 +1,115 @@
+# sim_stats.py
+
+#Rôle global :
+# indicateurs du simulateur calculés au fil de l'eau, en mémoire constante (aucun journal de missions) :
+# moyenne/variance des temps de réponse (Welford), quantiles (algorithme P²),
+# temps d'occupation cumulé par hôpital et nombre d'appels non servis
+
+import numpy as np
+
+
+#estimation d'un quantile en mémoire constante : algorithme P² (Jain & Chlamtac, 1985)
+#5 marqueurs dont les hauteurs sont ajustées par interpolation parabolique à chaque observation
+class P2Quantile:
+    def __init__(self, p):
+        self.p = p
+        self.q = []                                        #hauteurs des marqueurs
+        self.n = [0, 1, 2, 3, 4]                           #positions réelles
+        self.np = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]      #positions souhaitées
+        self.dn = [0.0, p / 2, p, (1 + p) / 2, 1.0]        #incréments des positions souhaitées
+
+    def add(self, x):
+        q, n = self.q, self.n
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+        if x < q[0]:
+            q[0] = x; k = 0
+        elif x >= q[4]:
+            q[4] = x; k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.np[i] += self.dn[i]
+        for i in (1, 2, 3):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < qp < q[i + 1]:
+                    # interpolation linéaire si la parabole sort de l'intervalle
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def value(self):
+        if not self.q:
+            return np.nan
+        if len(self.q) < 5:
+            return float(np.quantile(self.q, self.p))
+        return self.q[2]
+
+
+#collecteur mis à jour par Simulator à chaque arrivée / fin de mission
+# m : nombre d'hôpitaux ; horizon : si fourni, le temps d'occupation est tronqué à l'horizon
+class SimStats:
+    def __init__(self, m, quantiles=(0.5, 0.9, 0.95), horizon=None):
+        self.n_calls = 0
+        self.n_unserved = 0
+        # Welford : nombre, moyenne et somme des carrés des écarts des temps de réponse
+        self.n_served = 0
+        self.mean_response = 0.0
+        self._m2 = 0.0
+        self.quantiles = tuple(quantiles)
+        self._p2 = [P2Quantile(q) for q in self.quantiles]
+        self.busy_time = np.zeros(m)   #intégrale du nombre d'ambulances occupées, par hôpital
+        self.horizon = horizon
+
+    def record_arrival(self, served, response=None):
+        self.n_calls += 1
+        if not served:
+            self.n_unserved += 1
+            return
+        self.n_served += 1
+        delta = response - self.mean_response
+        self.mean_response += delta / self.n_served
+        self._m2 += delta * (response - self.mean_response)
+        for est in self._p2:
+            est.add(response)
+
+    def record_completion(self, hop, start, end):
+        if self.horizon is not None:
+            end = min(end, self.horizon)
+        if end > start:
+            self.busy_time[hop] += end - start
+
+    @property
+    def var_response(self):
+        return self._m2 / (self.n_served - 1) if self.n_served > 1 else np.nan
+
+    def response_quantiles(self):
+        return np.array([est.value() for est in self._p2])
+
+    #taux d'occupation par hôpital : temps occupé / (x_j * horizon)
+    def utilisation(self, x, horizon=None):
+        horizon = horizon if horizon is not None else self.horizon
+        capacity = np.asarray(x, dtype=float) * horizon
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(capacity > 0, self.busy_time / capacity, np.nan)
+
+    #même format que simulator.summarize_missions
+    def summary(self, x, horizon=None):
+        return {
+            'n_calls': self.n_calls,
+            'service_rate': self.n_served / self.n_calls if self.n_calls else np.nan,
+            'utilisation': self.utilisation(x, horizon),
+            'mean_response': self.mean_response if self.n_served else np.nan,
+            'response_quantiles': self.response_quantiles(),
+        }
@@ -1,7 +1,14 @@
 # simulator.py
+import os
+import pickle #format binaire des instantanés (snapshot / restore)
 import heapq #pour la gestion de la file d'événements
-import random #pour la génération de nombres aléatoires
+import itertools #compteur de séquence (départage des événements simultanés)
+from collections import deque #stocks d'ambulances (retrait/ajout en O(1))
 import numpy as np
+from scipy.sparse import issparse, csr_matrix
+from mission_log import MissionLog, ARRIVAL, COMPLETION
+from sim_stats import SimStats
+from alias_table import AliasTable
 
 
 class Mission:
@@ -14,74 +21,175 @@ class Mission:
         self.end_time = end_time
 
 
+#tirage vectorisé des appels sur [t_start, t_end) avec un numpy.random.Generator
+# rate_lambda : appels par minute
+# rate_profile : multiplicateurs horaires optionnels (ex. 24 valeurs), le taux de l'heure h étant
+#                rate_lambda * rate_profile[h % len(rate_profile)] ; processus non homogène obtenu par amincissement
+#                (thinning) d'un processus homogène de taux rate_lambda * max(rate_profile)
+# demand : AliasTable optionnelle (adresses tirées selon leurs poids, éventuellement horaires), sinon uniforme
+#renvoie (instants triés, indices d'adresses, durées de soins) sous forme de tableaux
+def sample_calls(rng, rate_lambda, t_start, t_end, n_addr, mean_service=20.0, rate_profile=None, demand=None):
+    peak = 1.0 if rate_profile is None else float(np.max(rate_profile))
+    # sachant leur nombre (loi de Poisson), les instants d'un processus de Poisson sont uniformes sur l'intervalle
+    k = rng.poisson(rate_lambda * peak * max(t_end - t_start, 0.0))
+    t = np.sort(rng.uniform(t_start, t_end, size=k))
+    if rate_profile is not None:
+        profile = np.asarray(rate_profile, dtype=float)
+        hour = (t // 60.0).astype(np.int64) % len(profile)
+        t = t[rng.random(k) * peak < profile[hour]]
+    addrs = rng.integers(n_addr, size=len(t)) if demand is None else demand.sample(rng, len(t), t)
+    services = rng.exponential(mean_service, size=len(t))
+    return t, addrs, services
+
+
+#index de dispatch au format CSR : pour chaque adresse, les hôpitaux qui la couvrent triés par temps de trajet
+#(à temps égal, par indice d'hôpital, comme l'ancien tri des candidats (t, j))
+#renvoie (indptr, hops, reach) : les hôpitaux de l'adresse i sont hops[indptr[i]:indptr[i+1]],
+#reach contient les temps de trajet correspondants
+def build_dispatch_index(A, times):
+    n = A.shape[0]
+    if issparse(A):
+        cover = csr_matrix(A).tocoo()
+        rows, cols = cover.row[cover.data != 0], cover.col[cover.data != 0]
+        reach = np.asarray(csr_matrix(times)[rows, cols], dtype=float).ravel()
+    else:
+        rows, cols = np.nonzero(np.asarray(A) == 1)
+        reach = np.asarray(times, dtype=float)[rows, cols]
+    order = np.lexsort((cols, reach, rows))
+    rows, hops, reach = rows[order], cols[order].astype(np.int64), reach[order]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, hops, reach
+
+
+#instantanés : encodage des événements en attente, un tableau structuré par type d'événement
+SNAPSHOT_VERSION = 1
+ARRIVAL_EVENT_DTYPE = np.dtype([('time', 'f8'), ('seq', 'i8'), ('addr', 'i8'), ('service', 'f8')])
+FINISH_EVENT_DTYPE = np.dtype([('time', 'f8'), ('seq', 'i8'), ('hop', 'i8'), ('amb', 'i8'),
+                               ('mission_id', 'i8'), ('addr', 'i8'), ('start', 'f8'), ('end', 'f8')])
+CHUNK_EVENT_DTYPE = np.dtype([('time', 'f8'), ('seq', 'i8'), ('t_start', 'f8')])
+
+
 class Simulator:
     #on intialise le simulateur avec les matrices A, dist, times, la solution initiale x_initial, et une graine aléatoire
-    def __init__(self, A, dist_matrix, times_matrix, x_initial, seed=0):
-        self.A = A
+    #A, dist_matrix et times_matrix peuvent être denses ou creuses (CSR, cf. build_sparse_matrices)
+    #log_path / log_flush_threshold : écriture progressive du journal sur disque (cf. MissionLog)
+    #log=False : pas de journal (missions_log vaut None) ; stats : collecteur SimStats optionnel, mis à jour en continu
+    #demand : poids des adresses (vecteur (n,), tableau horaire (H, n) ou AliasTable) ; None = tirage uniforme
+    #dispatch_index : résultat de build_dispatch_index(A, times) déjà calculé (réutilisé tel quel, non copié),
+    #                 pour ne pas refaire le tri à chaque réplication sur les mêmes matrices
+    def __init__(self, A, dist_matrix, times_matrix, x_initial, seed=0, log_path=None, log_flush_threshold=None,
+                 log=True, stats=None, demand=None, dispatch_index=None):
+        self.sparse = issparse(A)
+        self.A = csr_matrix(A) if self.sparse else A
         self.dist = dist_matrix
-        self.times = times_matrix
+        self.times = csr_matrix(times_matrix) if issparse(times_matrix) else times_matrix
+        #classement fixe des hôpitaux par adresse, calculé une fois (cf. build_dispatch_index)
+        if dispatch_index is None:
+            dispatch_index = build_dispatch_index(self.A, self.times)
+        self.dispatch_ptr, self.dispatch_hop, self.dispatch_reach = dispatch_index
         self.x = list(x_initial)
-        #l'état des stocks. Si x_initial (la solution de Gurobi) dit qu'il y a 2 ambulances à l'hôpital 0, available[0] sera [0, 1]
-        self.available = [list(range(x_initial[j])) for j in range(len(x_initial))]
+        #l'état des stocks. Si x_initial (la solution de Gurobi) dit qu'il y a 2 ambulances à l'hôpital 0, available[0] sera deque([0, 1])
+        self.available = [deque(range(x_initial[j])) for j in range(len(x_initial))]
         self.busy = {j: {} for j in range(len(x_initial))}
-        self.event_q = []  #file d'événements
+        self.event_q = []  #file d'événements (tas binaire de (temps, séquence, fonction, arguments))
+        self._seq = itertools.count()  #numéro de séquence : à temps égal, ordre d'insertion (FIFO)
         self.clock = 0.0  #horloge virtuelle du simulateur
         self.next_mission_id = 1  #ID unique pour chaque mission
-        self.missions_log = []   #journal des missions
-        random.seed(seed)    #initialisation de la graine aléatoire
+        self.missions_log = MissionLog(flush_path=log_path, flush_threshold=log_flush_threshold) if log else None   #journal des missions (colonnes NumPy)
+        self.stats = stats  #indicateurs au fil de l'eau (cf. SimStats)
+        self.rng = np.random.default_rng(seed)    #générateur aléatoire (reproductible par la graine)
+        self.mean_service = 20.0  #durée moyenne des soins (minutes)
+        self._arrivals = None  #paramètres de génération des appels (cf. generate_arrival)
+        #table d'alias construite une fois : chaque tirage pondéré d'adresse coûte O(1)
+        self.demand = demand if demand is None or isinstance(demand, AliasTable) else AliasTable(demand)
+
+
+
 
+    #ouvre directement un magasin binaire (cf. matrix_store.save_matrix_store), sans recalcul
+    @classmethod
+    def from_store(cls, path, x_initial, seed=0, demand=None):
+        from matrix_store import load_matrix_store
+        A, dist, times, _ = load_matrix_store(path)
+        return cls(A, dist, times, x_initial, seed=seed, demand=demand)
 
 
 
     def schedule_event(self, time, func, *args):
-        heapq.heappush(self.event_q, (time, func, args))
+        heapq.heappush(self.event_q, (time, next(self._seq), func, args))
         #Cette fonction insère un événement futur dans la chronologie 
-        # sans désordonner la file d'attente
+        # sans désordonner la file d'attente (O(log n))
+        # le numéro de séquence évite de comparer les fonctions quand deux événements ont le même temps
 
 #horizon représente la durée totale de la simulation.
 
 #génération des Appels
 #On simule l'arrivée des appels d'urgence selon une loi de Poisson,
 #  ce qui est le standard pour modéliser des flux aléatoires d'événements indépendants.
-    def generate_arrival(self, rate_lambda, horizon):
-        t = 0.0  #on initialise l'horloge locale a 0
-        while t < horizon:   #tant que l'horloge locale est inférieure à l'horizon
-            u = random.random() #On tire un nombre aléatoire uniforme entre 0 et 1
-            inter = -np.log(u) / rate_lambda
-            t += inter #on calcule le temps d'attente jusqu'au prochain appel
-            if t >= horizon: break #si on dépasse l'horizon, on arrête
-            self.schedule_event(t, self.handle_arrival, None)
+#Les appels (instants, adresses, durées de soins) sont tirés en bloc par sample_calls.
+# rate_profile : multiplicateurs horaires du taux (processus non homogène), cf. sample_calls
+# chunk_minutes : si fourni, les appels sont tirés par tranches de cette durée ; la tranche suivante
+#                 n'est tirée qu'au moment où la simulation l'atteint (file d'événements bornée)
+    def generate_arrival(self, rate_lambda, horizon, rate_profile=None, chunk_minutes=None):
+        self._arrivals = (rate_lambda, horizon, rate_profile, chunk_minutes or horizon)
+        self._load_chunk(0.0)
+
+    def _load_chunk(self, t_start):
+        rate_lambda, horizon, rate_profile, chunk = self._arrivals
+        t_end = min(t_start + chunk, horizon)
+        self.load_calls(*sample_calls(self.rng, rate_lambda, t_start, t_end, self.A.shape[0],
+                                      self.mean_service, rate_profile, self.demand))
+        if t_end < horizon:
+            self.schedule_event(t_end, self._load_chunk, t_end)
+
+#insère en bloc des appels déjà tirés (instants, adresses, durées de soins) dans la file d'événements
+    def load_calls(self, times, addrs, services):
+        seq = self._seq
+        self.event_q.extend((t, next(seq), self.handle_arrival, ((a, s),))
+                            for t, a, s in zip(np.asarray(times, dtype=float).tolist(),
+                                               np.asarray(addrs).tolist(),
+                                               np.asarray(services, dtype=float).tolist()))
+        heapq.heapify(self.event_q)   # O(n) au lieu de n insertions en O(log n)
 
 
 #traitement d'appel 
-    def handle_arrival(self, _):
+#call : (adresse, durée de soins) tirés à l'avance, ou None pour un tirage immédiat
+    def handle_arrival(self, call):
         n_addr = self.A.shape[0]
         #Choix d'une adresse 
-        addr = random.randrange(n_addr)
+        if call is None:
+            if self.demand is None:
+                addr = int(self.rng.integers(n_addr))
+            else:
+                addr = int(self.demand.sample(self.rng, t=self.clock))
+            service = None
+        else:
+            addr, service = call
 
-        #Trouver les hôpitaux candidats disponibles
-        candidates = []
-        for j in range(self.A.shape[1]):
-         # Condition A : L'hôpital couvre l'adresse (temps < Tmax)
-          # Condition B : L'hôpital a au moins une ambulance libre
-         if self.A[addr,j] == 1 and len(self.available[j]) > 0:
-            t_reach = self.times[addr,j]
-            candidates.append((t_reach, j))
+        #Parcours des hôpitaux couvrant l'adresse, du plus proche au plus loin (temps < Tmax) :
+        # on s'arrête au premier qui a au moins une ambulance libre
+        lo, hi = int(self.dispatch_ptr[addr]), int(self.dispatch_ptr[addr+1])
+        chosen_hop = None
+        for k, j in enumerate(self.dispatch_hop[lo:hi].tolist()):
+            if self.available[j]:
+                chosen_hop, t_reach = j, float(self.dispatch_reach[lo + k])
+                break
 
             # Cas d'échec (Aucune ambulance dispo ou zone non couverte)
-        if not candidates:
-            self.missions_log.append({'time': self.clock, 'addr': addr, 'served': False})
+        if chosen_hop is None:
+            if self.missions_log is not None:
+                self.missions_log.append(self.clock, ARRIVAL, addr)
+            if self.stats is not None:
+                self.stats.record_arrival(False)
             return
-        
-        # Choix du meilleur hôpital (plus proche en temps)
-        candidates.sort()   #trie par temps croissant
-        t_reach, chosen_hop = candidates[0]
 
         #allocation de l'ambulance et planification de la mission
-        amb_id = self.available[chosen_hop].pop(0) #on retire la première ambulance dispo du stock
+        amb_id = self.available[chosen_hop].popleft() #on retire la première ambulance dispo du stock (O(1))
        
         #Calcul de la durée de service (Trajet Aller + Soins + Retour)
-        service = random.expovariate(1/20.0)  
+        if service is None:
+            service = float(self.rng.exponential(self.mean_service))
 
         end_time = self.clock + t_reach + service + t_reach #retour a l'hôpital
 
@@ -92,14 +200,21 @@ class Simulator:
 
         # Planification de la libération de l'ambulance
         self.schedule_event(end_time, self.finish_mission, chosen_hop, amb_id, mission)
-        self.missions_log.append({'time': self.clock, 'addr': addr, 'served': True, 'hop': chosen_hop, 'start': self.clock, 'expected_end': end_time})
+        if self.missions_log is not None:
+            self.missions_log.append(self.clock, ARRIVAL, addr, chosen_hop, True, self.clock, end_time, mission.id)
+        if self.stats is not None:
+            self.stats.record_arrival(True, t_reach)
 
 
 #L'ambulance est libérée et redevient immédiatement disponible pour une nouvelle mission
     def finish_mission(self, hop_idx, amb_id, mission):
         del self.busy[hop_idx][amb_id]
         self.available[hop_idx].append(amb_id)
-        self.missions_log.append({'time': self.clock, 'completed': True, 'mission_id': mission.id, 'hop': hop_idx})
+        if self.missions_log is not None:
+            self.missions_log.append(self.clock, COMPLETION, mission.addr_idx, hop_idx, True,
+                                     mission.start_time, mission.end_time, mission.id)
+        if self.stats is not None:
+            self.stats.record_completion(hop_idx, mission.start_time, mission.end_time)
 
 
 
@@ -107,7 +222,240 @@ class Simulator:
 # on avance l'heure (self.clock) à cet instant, et on exécute la fonction associée (handle_arrival ou finish_mission).
     def run(self, horizon):
         while self.event_q:
-            time, func, args = heapq.heappop(self.event_q)
-            self.clock = time
-            func(*args)
-        return self.missions_log
\ No newline at end of file
+            self.step()
+        if self.missions_log is not None:
+            self.missions_log.flush()
+        return self.missions_log
+
+#traite un seul événement (le plus proche dans le temps) ; renvoie False si la file est vide
+    def step(self):
+        if not self.event_q:
+            return False
+        time, _, func, args = heapq.heappop(self.event_q)
+        self.clock = time
+        func(*args)
+        return True
+
+#traite les événements jusqu'à l'instant t inclus (préchauffage avant un instantané, reprise par tranches)
+    def run_until(self, t):
+        while self.event_q and self.event_q[0][0] <= t:
+            self.step()
+        self.clock = max(self.clock, t)
+
+
+#Instantané de l'état complet (hors matrices, fournies à nouveau à restore) :
+# horloge, compteurs, file d'événements, stocks d'ambulances, état du générateur aléatoire,
+# paramètres de génération des appels, indicateurs (SimStats) et journal en mémoire.
+#Les événements sont encodés par nom de méthode dans des tableaux NumPy (format binaire compact) ;
+#les missions en cours (busy) se déduisent des fins de mission en attente.
+#renvoie les octets de l'instantané ; path : écrit aussi le fichier (écriture atomique)
+#NB : le format repose sur pickle, ne restaurer que des fichiers de confiance
+    def snapshot(self, path=None, include_log=True):
+        arrivals, finishes, chunks = [], [], []
+        for t, seq, func, args in self.event_q:
+            name = func.__name__
+            if name == 'handle_arrival':
+                addr, service = args[0] if args[0] is not None else (-1, np.nan)
+                arrivals.append((t, seq, addr, service))
+            elif name == 'finish_mission':
+                hop, amb, mission = args
+                finishes.append((t, seq, hop, amb, mission.id, mission.addr_idx, mission.start_time, mission.end_time))
+            elif name == '_load_chunk':
+                chunks.append((t, seq, args[0]))
+            else:
+                raise ValueError(f"Événement non sérialisable : {name}")
+        # prochain numéro de séquence (on recrée le compteur, l'état est inchangé)
+        next_seq = next(self._seq)
+        self._seq = itertools.count(next_seq)
+        log = self.missions_log if include_log else None
+        if log is not None and log.flush_path is not None:
+            log.flush()   # le fichier sur disque est alors cohérent avec l'instantané (cf. restore)
+        state = {
+            'version': SNAPSHOT_VERSION,
+            'shape': tuple(self.A.shape),
+            'n_cover': len(self.dispatch_hop),
+            'x': list(self.x),
+            'clock': self.clock,
+            'next_seq': next_seq,
+            'next_mission_id': self.next_mission_id,
+            'available': [np.fromiter(pool, dtype=np.int64, count=len(pool)) for pool in self.available],
+            'arrivals': np.array(arrivals, dtype=ARRIVAL_EVENT_DTYPE),
+            'finishes': np.array(finishes, dtype=FINISH_EVENT_DTYPE),
+            'chunks': np.array(chunks, dtype=CHUNK_EVENT_DTYPE),
+            'rng': self.rng.bit_generator.state,
+            'mean_service': self.mean_service,
+            'arrival_params': self._arrivals,
+            'demand': self.demand,
+            'stats': self.stats,
+            'log': log,
+        }
+        data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        if path is not None:
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return data
+
+#reconstruit un simulateur à partir d'un instantané (octets ou chemin de fichier) et des mêmes matrices
+#le journal écrit sur disque (log_path) est tronqué à ce qu'il contenait au moment de l'instantané
+#dispatch_index : cf. __init__ (fork transmet celui du simulateur d'origine)
+    @classmethod
+    def restore(cls, snapshot, A, dist_matrix, times_matrix, dispatch_index=None):
+        if isinstance(snapshot, (str, os.PathLike)):
+            with open(snapshot, 'rb') as f:
+                snapshot = f.read()
+        state = pickle.loads(snapshot)
+        if state.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Version d'instantané non supportée : {state.get('version')}")
+        sim = cls(A, dist_matrix, times_matrix, state['x'], log=False, stats=state['stats'], demand=state['demand'],
+                  dispatch_index=dispatch_index)
+        if tuple(sim.A.shape) != state['shape'] or len(sim.dispatch_hop) != state['n_cover']:
+            raise ValueError(f"Matrices incompatibles avec l'instantané (attendu {state['shape']}, "
+                             f"{state['n_cover']} couples couverts)")
+        sim.clock = state['clock']
+        sim._seq = itertools.count(state['next_seq'])
+        sim.next_mission_id = state['next_mission_id']
+        sim.available = [deque(pool.tolist()) for pool in state['available']]
+        sim.rng.bit_generator.state = state['rng']
+        sim.mean_service = state['mean_service']
+        sim._arrivals = state['arrival_params']
+
+        log = state['log']
+        if log is not None and log.flush_path is not None and os.path.exists(log.flush_path):
+            with open(log.flush_path, 'r+b') as f:
+                f.truncate(log.n_flushed * log._buf.dtype.itemsize)
+        sim.missions_log = log
+
+        handle = sim.handle_arrival
+        events = [(t, seq, handle, ((addr, service) if addr >= 0 else None,))
+                  for t, seq, addr, service in state['arrivals'].tolist()]
+        for t, seq, hop, amb, mid, addr, start, end in state['finishes'].tolist():
+            mission = Mission(mid, addr, hop, start, end)
+            sim.busy[hop][amb] = mission
+            events.append((t, seq, sim.finish_mission, (hop, amb, mission)))
+        for t, seq, t_start in state['chunks'].tolist():
+            events.append((t, seq, sim._load_chunk, (t_start,)))
+        heapq.heapify(events)
+        sim.event_q = events
+        return sim
+
+#branche "what-if" à partir de l'état courant (l'original n'est pas modifié)
+# seed : nouvelle graine ; les appels futurs déjà tirés sont alors retirés et tirés à nouveau à partir de clock
+# rate_lambda / rate_profile : nouveau taux d'appels pour la suite (tirage à nouveau également)
+# le journal n'est pas copié : la branche démarre avec un journal vide ; les indicateurs (stats) sont copiés
+    def fork(self, seed=None, rate_lambda=None, rate_profile=None, log=True):
+        branch = Simulator.restore(self.snapshot(include_log=False), self.A, self.dist, self.times,
+                                   (self.dispatch_ptr, self.dispatch_hop, self.dispatch_reach))
+        if log:
+            branch.missions_log = MissionLog()
+        if seed is None and rate_lambda is None and rate_profile is None:
+            return branch
+        if seed is not None:
+            branch.rng = np.random.default_rng(seed)
+        if branch._arrivals is not None:
+            rate, horizon, profile, chunk = branch._arrivals
+            branch._arrivals = (rate if rate_lambda is None else rate_lambda, horizon,
+                                profile if rate_profile is None else rate_profile, chunk)
+            branch.event_q = [e for e in branch.event_q if e[2].__name__ not in ('handle_arrival', '_load_chunk')]
+            heapq.heapify(branch.event_q)
+            if branch.clock < horizon:
+                branch._load_chunk(branch.clock)
+        return branch
+
+
+# ---------------------------------------------------------------------------
+# Réplications indépendantes sans interface (pas de pause, pas de signal Qt)
+# ---------------------------------------------------------------------------
+
+_WORKER = {}
+
+
+#chaque processus reçoit A, times et x une seule fois (et non à chaque réplication),
+#et calcule une seule fois l'index de dispatch partagé par toutes ses réplications
+def _init_worker(A, times, x, demand=None):
+    _WORKER['A'], _WORKER['times'], _WORKER['x'], _WORKER['demand'] = A, times, x, demand
+    _WORKER['index'] = build_dispatch_index(A, times)
+
+
+#indicateurs d'une réplication, calculés sur son journal de missions (MissionLog ou tableau structuré)
+def summarize_missions(log, times, x, horizon, quantiles):
+    log = log.view() if isinstance(log, MissionLog) else log
+    arrivals = log[log['kind'] == ARRIVAL]
+    served = arrivals[arrivals['served']]
+    m = len(x)
+    busy = np.zeros(m)
+    if len(served):
+        addr, hop = served['addr'], served['hop']
+        end = np.minimum(served['end'], horizon)
+        # temps de réponse = trajet hôpital -> adresse
+        response = np.asarray(times[addr, hop], dtype=float).ravel()
+        np.add.at(busy, hop, np.maximum(end - served['start'], 0.0))
+    else:
+        response = np.zeros(0)
+    capacity = np.asarray(x, dtype=float) * horizon
+    with np.errstate(invalid='ignore', divide='ignore'):
+        utilisation = np.where(capacity > 0, busy / capacity, np.nan)
+    return {
+        'n_calls': len(arrivals),
+        'service_rate': len(served) / len(arrivals) if len(arrivals) else np.nan,
+        'utilisation': utilisation,
+        'mean_response': float(response.mean()) if len(response) else np.nan,
+        'response_quantiles': np.quantile(response, quantiles) if len(response) else np.full(len(quantiles), np.nan),
+    }
+
+
+#une réplication sans journal : indicateurs au fil de l'eau (SimStats) et appels tirés par tranches d'une heure,
+#la mémoire reste constante quel que soit l'horizon (quantiles estimés par P²)
+def _replicate(args):
+    seed, rate, horizon, quantiles, rate_profile = args
+    A, times, x = _WORKER['A'], _WORKER['times'], _WORKER['x']
+    stats = SimStats(len(x), quantiles, horizon)
+    sim = Simulator(A, None, times, x, seed=seed, log=False, stats=stats, demand=_WORKER['demand'],
+                    dispatch_index=_WORKER['index'])
+    sim.generate_arrival(rate, horizon, rate_profile, chunk_minutes=60.0)
+    sim.run(horizon)
+    return stats.summary(x, horizon)
+
+
+#moyenne et demi-largeur de l'intervalle de confiance (loi de Student) le long de l'axe 0
+def _mean_ci(values, confidence):
+    from scipy.stats import t as student
+    values = np.asarray(values, dtype=float)
+    mean = np.nanmean(values, axis=0)
+    k = np.sum(~np.isnan(values), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        half = student.ppf(0.5 + confidence / 2, np.maximum(k - 1, 1)) * np.nanstd(values, axis=0, ddof=1) / np.sqrt(k)
+    return mean, np.where(k > 1, half, np.nan)[()]
+
+
+#lance n_reps réplications indépendantes sur un pool de processus
+# rate : appels par minute, horizon : durée simulée (minutes), rate_profile : cf. sample_calls
+# seeds : graines des réplications (défaut 0..n_reps-1), processes : nombre de processus (1 = sans pool)
+# demand : poids des adresses, cf. Simulator (la table d'alias est construite une fois et transmise aux processus)
+#renvoie un dict de (moyenne, demi-largeur IC) : taux de service, utilisation par hôpital,
+#temps de réponse moyen et quantiles ; 'replications' contient les indicateurs bruts
+def run_replications(A, times, x, rate, horizon, n_reps=10, seeds=None, processes=None,
+                     confidence=0.95, quantiles=(0.5, 0.9, 0.95), rate_profile=None, demand=None):
+    from concurrent.futures import ProcessPoolExecutor
+    if seeds is None:
+        seeds = range(n_reps)
+    seeds = list(seeds)[:n_reps]
+    quantiles = tuple(quantiles)
+    tasks = [(seed, rate, horizon, quantiles, rate_profile) for seed in seeds]
+    if demand is not None and not isinstance(demand, AliasTable):
+        demand = AliasTable(demand)
+    if processes == 1:
+        _init_worker(A, times, x, demand)
+        reps = [_replicate(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(A, times, list(x), demand)) as pool:
+            reps = list(pool.map(_replicate, tasks))
+
+    result = {'n_reps': len(reps), 'confidence': confidence, 'replications': reps}
+    for key in ('service_rate', 'utilisation', 'mean_response'):
+        result[key] = _mean_ci([r[key] for r in reps], confidence)
+    mean_q, half_q = _mean_ci([r['response_quantiles'] for r in reps], confidence)
+    result['response_quantiles'] = {q: (mean_q[k], half_q[k]) for k, q in enumerate(quantiles)}
+    return result
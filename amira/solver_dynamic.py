@@ -1,85 +1,437 @@
+import time
 import numpy as np
-from gurobipy import Model, GRB, quicksum
-import pulp
+from scipy.sparse import issparse, csr_matrix, diags, identity, hstack, vstack
+from scipy.optimize import milp, LinearConstraint, Bounds   # HiGHS (fourni avec scipy)
 
+# backends optionnels : le module reste utilisable sans licence Gurobi (CBC via PuLP ou HiGHS)
+try:
+    from gurobipy import Model, GRB, quicksum, LinExpr
+except ImportError:
+    Model = None
+try:
+    import pulp
+except ImportError:
+    pulp = None
 
+BACKENDS = ('gurobi', 'highs', 'cbc')
+
+M2 = 1 # Poids moyen pour la pénalité "hôpital vide" (équité)
+
+
+#coefficient de e[j] dans l'objectif, identique pour tous les backends
+#avec M2 = 1, placer une ambulance (x[j] = 1) ou déclarer l'hôpital vide (e[j] = 1) coûtent autant.
+#Un hôpital vide coûte donc 1 / (2 (m+1)) de moins : la somme de ces termes reste < 1/2, l'optimum du critère
+#principal (entier) est inchangé et, à critère égal, on laisse l'hôpital vide plutôt que d'acheter une ambulance.
+#Le départage reste soumis à l'écart d'optimalité par défaut de chaque solveur : il n'est pas garanti
+#sur les grandes instances (m grand), où deux backends peuvent renvoyer des totaux différents
+def empty_penalty(m):
+    return M2 - 0.5 / (m + 1)
+
+
+#matrice des coefficients de couverture C[i,j] = A[i,j] * (1 - p[j]), au format CSR
+#(seuls les couples qui couvrent sont stockés, que A soit dense ou creuse)
+def coverage_coefficients(A, p):
+    A = csr_matrix(A, dtype=float)
+    return csr_matrix(A @ diags(1.0 - np.asarray(p, dtype=float)))
+
+
+#présolve : réduction des lignes de couverture identiques ou dominées (A binaire)
+#la ligne de l'adresse i s'écrit sum_j A[i,j] (1-p[j]) x[j] >= 1, avec des coefficients >= 0 identiques par colonne :
+#si les hôpitaux couvrant i sont un sous-ensemble de ceux couvrant k, la contrainte de i implique celle de k
+#=> on ne garde qu'une ligne par ensemble distinct (hachage des lignes), puis seulement les ensembles minimaux
+#renvoie (keep, row_map) :
+# keep    : indices (dans A) des lignes conservées
+# row_map : pour chaque adresse i, la position dans keep de la ligne conservée qui implique sa couverture
+def reduce_coverage_rows(A, block_size=2048):
+    B = csr_matrix(csr_matrix(A) != 0, dtype=np.int32)
+    B.sort_indices()
+    n = B.shape[0]
+
+    # 1) lignes identiques : hachage de l'ensemble des colonnes couvrantes
+    first = {}
+    uid = np.empty(n, dtype=np.int64)
+    for i in range(n):
+        key = B.indices[B.indptr[i]:B.indptr[i+1]].tobytes()
+        uid[i] = first.setdefault(key, len(first))
+    k = len(first)
+    reps = np.zeros(k, dtype=np.int64)
+    reps[uid[::-1]] = np.arange(n)[::-1]   # première occurrence de chaque ensemble
+    U = B[reps]
+    size = np.diff(U.indptr)
+
+    # 2) dominance : la ligne r est redondante s'il existe a != r avec U_a inclus dans U_r,
+    #    c'est-à-dire |U_r ∩ U_a| == |U_a| (les lignes étant distinctes, |U_a| < |U_r|)
+    #    parmi ces a, celui de plus petite taille n'est lui-même dominé par personne : il sert de représentant
+    best = np.arange(k)
+    empty = np.flatnonzero(size == 0)
+    if len(empty) > 0:
+        # une adresse non couverte rend le modèle infaisable : elle suffit à elle seule
+        best[:] = empty[0]
+    else:
+        UT = csr_matrix(U.T)
+        for start in range(0, k, block_size):
+            stop = min(start + block_size, k)
+            inter = (U[start:stop] @ UT).tocoo()
+            r = inter.row + start
+            a = inter.col
+            sub = (inter.data == size[a]) & (a != r)
+            r, a = r[sub], a[sub]
+            if len(r) == 0:
+                continue
+            # pour chaque r, le sous-ensemble a de taille minimale
+            order = np.lexsort((size[a], r))
+            r, a = r[order], a[order]
+            head = np.ones(len(r), dtype=bool)
+            head[1:] = r[1:] != r[:-1]
+            best[r[head]] = a[head]
+
+    kept_u = np.flatnonzero(best == np.arange(k))
+    pos = np.full(k, -1, dtype=np.int64)
+    pos[kept_u] = np.arange(len(kept_u))
+    return reps[kept_u], pos[best[uid]]
+
+
+#liste des backends utilisables sur cette machine, par ordre de préférence
+def available_backends():
+    found = []
+    if Model is not None: found.append('gurobi')
+    found.append('highs')
+    if pulp is not None: found.append('cbc')
+    return found
+
+
+#résout le nom de backend ('auto' => le premier disponible)
+def resolve_backend(backend='auto'):
+    if backend == 'auto':
+        return available_backends()[0]
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend inconnu: {backend} (choix: {', '.join(BACKENDS)})")
+    if backend not in available_backends():
+        raise ImportError(f"Backend '{backend}' indisponible (module non installé)")
+    return backend
+
+
+# Construction Gurobi
 # paramètres:
-# A: matrice de couverture (n adresses x m hôpitaux)
-# p: indisponibilité pour chaque ambulance 
-# budget: Montant total disponible pour l'achat des ambulances 
+# A: matrice de couverture (n adresses x m hôpitaux), dense (numpy) ou creuse (scipy.sparse)
+# p: indisponibilité pour chaque ambulance
+# budget: Montant total disponible pour l'achat des ambulances
 # cost_per_amb: Coût unitaire d'une ambulance
 # min_per_hop: Minimum souhaité d'ambulances par hôpital (défaut=1)
+# method: 'matrix' (toutes les contraintes de couverture ajoutées en un bloc C @ x >= 1 via l'API MVar)
+#         ou 'loop' (une contrainte Python par adresse, construction historique)
+#
+# renvoie (model, x_vars, budget_constr) : x_vars est la liste des variables x[j],
+# budget_constr la contrainte 'Budget_Limit' (None si pas de budget)
+
+def build_model(A, p, budget=None, cost_per_amb=None, min_per_hop=1, method='matrix'):
 
-def solve_dynamic_expected(A, p, budget=None, cost_per_amb=None, min_per_hop=1):
-    
     n, m = A.shape #renvoie les dimensions de la matrice
 
     # Initialisation d'un modèle Gurobi vide
-    model = Model('dynamic_expected_strict_coverage') 
+    model = Model('dynamic_expected_strict_coverage')
     model.setParam('OutputFlag', 0) # Désactive le blabla technique dans la console
+    w_e = empty_penalty(m)
 
-    # Variables de décision
+    if method == 'matrix':
+        # Mêmes variables, objectif et contraintes que la construction 'loop' ci-dessous,
+        # mais chaque famille de contraintes est ajoutée en une seule opération matricielle.
+        x = model.addMVar(m, vtype=GRB.INTEGER, lb=0, name='x')
+        e = model.addMVar(m, vtype=GRB.BINARY, name='e')
+        model.setObjective(x.sum() + w_e * e.sum(), GRB.MINIMIZE)
 
-    # x: nombre d'ambulances à placer à chaque hôpital
-    # On remet lb=0 ici car si le budget est trop serré, 
-    # le solveur doit avoir le droit de laisser un hôpital vide (x=0) en payant une pénalité.
-    x = model.addVars(m, vtype=GRB.INTEGER, lb=0, name='x') 
+        # A. Couverture (STRICTE) : C @ x >= 1 avec C[i,j] = A[i,j] * (1 - p[j])
+        model.addConstr(coverage_coefficients(A, p) @ x >= np.ones(n), name='cov')
 
-    # e (Empty): Variable binaire de pénalité.
-    # Vaut 1 si un hôpital est VIDE (ne possède pas d'ambulance).
-    # Cela permet de "sacrifier" un hôpital pour respecter le budget.
-    e = model.addVars(m, vtype=GRB.BINARY, name='e')
+        # B. Au moins min_per_hop ambulances par hôpital, sauf si e[j]=1 (SOUPLE)
+        if min_per_hop > 0:
+            model.addConstr(x + e >= min_per_hop, name='min_h')
 
-    
+        x_vars = x.tolist()
+    else:
+        # Variables de décision
 
-    # fonction objective
+        # x: nombre d'ambulances à placer à chaque hôpital
+        # On remet lb=0 ici car si le budget est trop serré,
+        # le solveur doit avoir le droit de laisser un hôpital vide (x=0) en payant une pénalité.
+        x = model.addVars(m, vtype=GRB.INTEGER, lb=0, name='x')
 
-    # Objectif : Minimiser (le nombre total d'ambulances + les Pénalités d'hôpitaux vides)
-    # On ne met plus de pénalité de couverture car la non-couverture est interdite.
-    M2 = 1 # Poids moyen pour la pénalité "hôpital vide" (équité)
+        # e (Empty): Variable binaire de pénalité.
+        # Vaut 1 si un hôpital est VIDE (ne possède pas d'ambulance).
+        # Cela permet de "sacrifier" un hôpital pour respecter le budget.
+        e = model.addVars(m, vtype=GRB.BINARY, name='e')
 
-    objective = quicksum(x[j] for j in range(m)) + \
-                (M2 * quicksum(e[j] for j in range(m)))
 
-    model.setObjective(objective, GRB.MINIMIZE)
-    # quicksum est une fonction de Gurobi pour sommer des expressions linéaires
-    
 
-    # CONTRAINTES 
+        # fonction objective
 
-    # A. Contrainte de Couverture (STRICTE)
-    for i in range(n): 
-        # C'est une obligation absolue de sécurité.
-        model.addConstr(sum(A[i,j] * (1-p[j]) * x[j] for j in range(m)) >= 1, name=f'cov_{i}')
-         #chaque adresse i doit être couverte par au moins une ambulance libre
-        
+        # Objectif : Minimiser (le nombre total d'ambulances + les Pénalités d'hôpitaux vides)
+        # On ne met plus de pénalité de couverture car la non-couverture est interdite.
+        # (poids de e : M2 moins le départage, cf. empty_penalty)
+        objective = quicksum(x[j] for j in range(m)) + \
+                    (w_e * quicksum(e[j] for j in range(m)))
 
-    # B. Contrainte de au mpin une ambulance par Hôpital (SOUPLE)
-    if min_per_hop > 0:
-        for j in range(m):
-            # x[j] doit être >= 1, SAUF si e[j]=1 (pénalité payée).
-            # Cela permet de fermer un hôpital si nécessaire.
-            model.addConstr(x[j] >= min_per_hop - e[j], name=f'min_h_{j}')
+        model.setObjective(objective, GRB.MINIMIZE)
+        # quicksum est une fonction de Gurobi pour sommer des expressions linéaires
+
+
+        # CONTRAINTES
+
+        # A. Contrainte de Couverture (STRICTE)
+        if issparse(A):
+            # forme creuse : on ne parcourt que les hôpitaux qui couvrent l'adresse i
+            A = csr_matrix(A)
+            for i in range(n):
+                cols = A.indices[A.indptr[i]:A.indptr[i+1]]
+                vals = A.data[A.indptr[i]:A.indptr[i+1]]
+                model.addConstr(quicksum(float(a) * (1-p[j]) * x[j] for a, j in zip(vals, cols)) >= 1, name=f'cov_{i}')
+        else:
+            for i in range(n):
+                # C'est une obligation absolue de sécurité.
+                model.addConstr(sum(A[i,j] * (1-p[j]) * x[j] for j in range(m)) >= 1, name=f'cov_{i}')
+                 #chaque adresse i doit être couverte par au moins une ambulance libre
+
+
+        # B. Contrainte de au mpin une ambulance par Hôpital (SOUPLE)
+        if min_per_hop > 0:
+            for j in range(m):
+                # x[j] doit être >= 1, SAUF si e[j]=1 (pénalité payée).
+                # Cela permet de fermer un hôpital si nécessaire.
+                model.addConstr(x[j] >= min_per_hop - e[j], name=f'min_h_{j}')
+
+        x_vars = [x[j] for j in range(m)]
 
     # C. Contrainte de Budget (STRICTE)
-    #  contrainte qu'on ne peut pas violer 
+    #  contrainte qu'on ne peut pas violer
+    budget_constr = None
     if budget is not None and cost_per_amb is not None and cost_per_amb > 0:
-        total_cost = sum(x[j] * cost_per_amb for j in range(m))
-        model.addConstr(total_cost <= budget, name='Budget_Limit')
-    
+        total_cost = LinExpr([float(cost_per_amb)] * m, x_vars)
+        budget_constr = model.addConstr(total_cost <= budget, name='Budget_Limit')
+
+    return model, x_vars, budget_constr
+
+
+#suivi de la résolution : callback(info) avec info = {'time': secondes écoulées} et, pendant le branch & bound,
+#'incumbent' (meilleure solution, None s'il n'y en a pas encore), 'bound', 'gap' (relatif) et 'nodes'
+#si le callback renvoie True, la résolution est interrompue (InterruptedError)
+def _check_interrupt(callback, info):
+    if callback is not None and callback(info):
+        raise InterruptedError("Résolution interrompue")
+
+
+#callback Gurobi : remonte l'incumbent et le gap, et arrête le solveur (model.terminate) à la demande
+def _gurobi_callback(callback):
+    t0 = time.perf_counter()   # RUNTIME n'est pas disponible pendant POLLING
+
+    def cb(model, where):
+        if where == GRB.Callback.MIP:
+            best = model.cbGet(GRB.Callback.MIP_OBJBST)
+            bound = model.cbGet(GRB.Callback.MIP_OBJBND)
+            found = best < GRB.INFINITY
+            info = {'time': time.perf_counter() - t0, 'incumbent': best if found else None,
+                    'bound': bound, 'gap': abs(best - bound) / max(abs(best), 1e-10) if found else float('inf'),
+                    'nodes': int(model.cbGet(GRB.Callback.MIP_NODCNT))}
+        elif where in (GRB.Callback.POLLING, GRB.Callback.PRESOLVE, GRB.Callback.SIMPLEX):
+            info = {'time': time.perf_counter() - t0}
+        else:
+            return
+        if callback(info):
+            model.terminate()
+    return cb
+
+
+#Résolution Gurobi : renvoie (x_sol ou None, temps de construction, temps de résolution)
+def _solve_gurobi(A, p, budget, cost_per_amb, min_per_hop, method, callback=None):
+    t0 = time.perf_counter()
+    model, x, _ = build_model(A, p, budget, cost_per_amb, min_per_hop, method)
+    model.update()
+    t1 = time.perf_counter()
+
     # Résolution du modèle
-    model.optimize()
+    if callback is None:
+        model.optimize()
+    else:
+        model.optimize(_gurobi_callback(callback))
+    t2 = time.perf_counter()
 
-    # Recupération de la solution
+    if model.status == GRB.INTERRUPTED:
+        raise InterruptedError("Résolution interrompue")
     if model.status == GRB.OPTIMAL:
-        # On récupère les valeurs de x
-        x_sol = [int(x[j].x) for j in range(m)]
+        # On récupère les valeurs de x (arrondies : le solveur renvoie des entiers à la tolérance près)
+        return [int(round(v.x)) for v in x], t1 - t0, t2 - t1
+    return None, t1 - t0, t2 - t1
+
+
+#Résolution HiGHS (scipy.optimize.milp) : même modèle, écrit sous forme matricielle
+# variables z = [x (m entiers >= 0), e (m binaires)]
+# milp n'a pas de callback : l'interruption n'est vérifiée qu'avant et après la résolution
+def _solve_highs(A, p, budget, cost_per_amb, min_per_hop, method=None, callback=None):
+    t0 = time.perf_counter()
+    n, m = A.shape
+    c = np.concatenate([np.ones(m), np.full(m, empty_penalty(m))])
+    C = coverage_coefficients(A, p)
+    blocks = [hstack([C, csr_matrix((n, m))])]
+    lb = [np.ones(n)]; ub = [np.full(n, np.inf)]
+    if min_per_hop > 0:
+        blocks.append(hstack([identity(m), identity(m)]))
+        lb.append(np.full(m, float(min_per_hop))); ub.append(np.full(m, np.inf))
+    if budget is not None and cost_per_amb is not None and cost_per_amb > 0:
+        blocks.append(csr_matrix(np.concatenate([np.full(m, float(cost_per_amb)), np.zeros(m)])[None, :]))
+        lb.append([-np.inf]); ub.append([float(budget)])
+    constraints = LinearConstraint(csr_matrix(vstack(blocks)), np.concatenate(lb), np.concatenate(ub))
+    bounds = Bounds(np.zeros(2 * m), np.concatenate([np.full(m, np.inf), np.ones(m)]))
+    t1 = time.perf_counter()
+    _check_interrupt(callback, {'time': 0.0})
+
+    res = milp(c, constraints=constraints, integrality=np.ones(2 * m), bounds=bounds)
+    t2 = time.perf_counter()
+    _check_interrupt(callback, {'time': t2 - t1})
+
+    if res.status == 0:
+        return [int(round(v)) for v in res.x[:m]], t1 - t0, t2 - t1
+    return None, t1 - t0, t2 - t1
+
+
+#Résolution CBC via PuLP (pas d'API matricielle : une contrainte par ligne de C, en ne parcourant que les non-zéros)
+#comme pour HiGHS, l'interruption n'est vérifiée qu'avant et après la résolution
+def _solve_cbc(A, p, budget, cost_per_amb, min_per_hop, method=None, callback=None):
+    t0 = time.perf_counter()
+    n, m = A.shape
+    prob = pulp.LpProblem('dynamic_expected_strict_coverage', pulp.LpMinimize)
+    x = [pulp.LpVariable(f'x_{j}', lowBound=0, cat='Integer') for j in range(m)]
+    e = [pulp.LpVariable(f'e_{j}', cat='Binary') for j in range(m)]
+    prob += pulp.lpSum(x) + empty_penalty(m) * pulp.lpSum(e)
+    C = coverage_coefficients(A, p)
+    for i in range(n):
+        lo, hi = C.indptr[i], C.indptr[i+1]
+        prob += pulp.lpSum(float(a) * x[j] for a, j in zip(C.data[lo:hi], C.indices[lo:hi])) >= 1, f'cov_{i}'
+    if min_per_hop > 0:
+        for j in range(m):
+            prob += x[j] + e[j] >= min_per_hop, f'min_h_{j}'
+    if budget is not None and cost_per_amb is not None and cost_per_amb > 0:
+        prob += pulp.lpSum(float(cost_per_amb) * x[j] for j in range(m)) <= budget, 'Budget_Limit'
+    t1 = time.perf_counter()
+    _check_interrupt(callback, {'time': 0.0})
+
+    status = prob.solve(pulp.PULP_CBC_CMD(msg=0))
+    t2 = time.perf_counter()
+    _check_interrupt(callback, {'time': t2 - t1})
+
+    if status == pulp.LpStatusOptimal:
+        return [int(round(v.value())) for v in x], t1 - t0, t2 - t1
+    return None, t1 - t0, t2 - t1
+
+
+_SOLVERS = {'gurobi': _solve_gurobi, 'highs': _solve_highs, 'cbc': _solve_cbc}
+
+
+# presolve: si True, les lignes de A identiques ou dominées sont retirées avant la construction
+#           (cf. reduce_coverage_rows) ; x étant indexé par hôpital, la solution est inchangée
+# backend: 'gurobi', 'highs', 'cbc' ou 'auto' (Gurobi s'il est installé, sinon HiGHS, sinon CBC) ;
+#          entrées et sorties identiques quel que soit le backend ; en cas d'optimums multiples, la solution
+#          (et, au-delà du départage x / e de empty_penalty, le total) peut différer d'un backend à l'autre
+# stats: dict optionnel, rempli avec le temps de construction du modèle (build_time),
+#        le temps de résolution (solve_time) en secondes, et la taille du modèle
+# callback: suivi et interruption de la résolution, cf. _check_interrupt (incumbent et gap avec Gurobi seulement) ;
+#           une résolution interrompue lève InterruptedError
+
+def solve_dynamic_expected(A, p, budget=None, cost_per_amb=None, min_per_hop=1, method='matrix', stats=None,
+                           presolve=True, backend='auto', callback=None):
+
+    backend = resolve_backend(backend)
+    t0 = time.perf_counter()
+    n_rows = A.shape[0]
+    row_map = None
+    if presolve:
+        keep, row_map = reduce_coverage_rows(A)
+        A = A[keep]
+    t_presolve = time.perf_counter() - t0
+
+    _check_interrupt(callback, {'time': 0.0})
+    x_sol, t_build, t_solve = _SOLVERS[backend](A, p, budget, cost_per_amb, min_per_hop, method, callback)
+
+    if stats is not None:
+        stats.update({'backend': backend, 'method': method, 'build_time': t_presolve + t_build,
+                      'solve_time': t_solve, 'presolve_time': t_presolve, 'n_rows': n_rows,
+                      'n_rows_kept': A.shape[0], 'row_map': row_map})
+
+    # Recupération de la solution
+    if x_sol is not None:
         # On renvoie x_sol et le nombre total d'ambulances
         return x_sol, int(sum(x_sol))
     else:
         # Si aucune solution n'est trouvée (Budget insuffisant pour couverture stricte)
         return None, None
-    
+
     # Si une solution optimale est trouvée,
     # on extrait les valeurs pour savoir combien d'ambulances placer dans chaque hôpital
-    # et on renvoie le résultat. Sinon, on signale l'échec.
\ No newline at end of file
+    # et on renvoie le résultat. Sinon, on signale l'échec.
+
+
+
+#balayage du budget : frontière "nombre d'ambulances / budget"
+#le modèle est construit une seule fois, seul le second membre de 'Budget_Limit' change entre deux résolutions ;
+#les budgets sont traités par ordre croissant, la solution précédente reste donc réalisable
+#et sert de point de départ (warm start) à la résolution suivante
+#le warm start n'existe qu'avec Gurobi ; les autres backends résolvent chaque budget indépendamment
+#renvoie (budgets, totals, X) :
+# budgets : budgets triés (tableau de taille K)
+# totals  : nombre total d'ambulances par budget (nan si infaisable)
+# X       : matrice K x m des allocations (-1 sur les lignes infaisables)
+# callback : cf. _check_interrupt ; appelé aussi entre deux budgets avec info['step'] (budgets traités)
+#            et info['n_steps'] ; une interruption lève InterruptedError
+def sweep_budget(A, p, budgets, cost_per_amb, min_per_hop=1, method='matrix', presolve=True, stats=None,
+                 backend='auto', callback=None):
+    if cost_per_amb is None or cost_per_amb <= 0:
+        raise ValueError('cost_per_amb doit être > 0 pour balayer le budget')
+    budgets = np.sort(np.asarray(budgets, dtype=float))
+    m = A.shape[1]
+    backend = resolve_backend(backend)
+
+    t0 = time.perf_counter()
+    if presolve:
+        keep, _ = reduce_coverage_rows(A)
+        A = A[keep]
+
+    totals = np.full(len(budgets), np.nan)
+    X = np.full((len(budgets), m), -1, dtype=int)
+    if backend != 'gurobi':
+        t_build = t_solve = 0.0
+        for k, b in enumerate(budgets):
+            _check_interrupt(callback, {'time': time.perf_counter() - t0, 'step': k, 'n_steps': len(budgets)})
+            x_sol, tb, ts = _SOLVERS[backend](A, p, b, cost_per_amb, min_per_hop, method, callback)
+            t_build += tb; t_solve += ts
+            if x_sol is not None:
+                X[k] = x_sol
+                totals[k] = sum(x_sol)
+        if stats is not None:
+            stats.update({'backend': backend, 'method': method, 'build_time': time.perf_counter() - t0 - t_solve,
+                          'solve_time': t_solve, 'n_solves': len(budgets)})
+        return budgets, totals, X
+
+    model, x, budget_constr = build_model(A, p, budgets[-1], cost_per_amb, min_per_hop, method)
+    model.update()
+    t1 = time.perf_counter()
+
+    incumbent = None
+    for k, b in enumerate(budgets):
+        _check_interrupt(callback, {'time': time.perf_counter() - t0, 'step': k, 'n_steps': len(budgets)})
+        budget_constr.RHS = b
+        if incumbent is not None:
+            for v, val in zip(x, incumbent):
+                v.Start = val
+        if callback is None:
+            model.optimize()
+        else:
+            model.optimize(_gurobi_callback(callback))
+        if model.status == GRB.INTERRUPTED:
+            raise InterruptedError("Résolution interrompue")
+        if model.status == GRB.OPTIMAL:
+            incumbent = [int(round(v.x)) for v in x]
+            X[k] = incumbent
+            totals[k] = sum(incumbent)
+
+    if stats is not None:
+        stats.update({'backend': backend, 'method': method, 'build_time': t1 - t0,
+                      'solve_time': time.perf_counter() - t1, 'n_solves': len(budgets)})
+    return budgets, totals, X